@@ -0,0 +1,124 @@
+import math
+from bisect import bisect_left, bisect_right
+
+
+class _Side:
+    """Limits of one direction on one pair, kept sorted, with ids in a parallel list"""
+
+    __slots__ = ('limits', 'ids')
+
+    def __init__(self):
+        self.limits = []
+        self.ids = []
+
+    def add(self, limit, key):
+        i = bisect_right(self.limits, limit)
+        self.limits.insert(i, limit)
+        self.ids.insert(i, key)
+
+    def extend(self, entries):
+        pairs = sorted(list(zip(self.limits, self.ids)) + entries, key=lambda e: e[0])
+        self.limits = [limit for limit, _ in pairs]
+        self.ids = [key for _, key in pairs]
+
+    def remove(self, limit, key):
+        i = bisect_left(self.limits, limit)
+        j = bisect_right(self.limits, limit, i)
+        for k in range(i, j):
+            if self.ids[k] == key:
+                del self.limits[k]
+                del self.ids[k]
+                return True
+        return False
+
+
+class ThresholdIndex:
+    """Active alerts per (exchange, symbol), sorted by limit.
+
+    `crossed(pair, price)` bisects straight to the alerts whose condition
+    holds -- `above` limits <= price and `below` limits >= price -- so an
+    update costs O(log n + k) however many alerts watch the pair. The index
+    is maintained incrementally with `add` / `discard`.
+    """
+
+    def __init__(self):
+        self._books = {}  # pair -> {'above': _Side, 'below': _Side}
+        self._where = {}  # (user_id, alert_id) -> (pair, direction, limit)
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def pairs(self):
+        return self._books.keys()
+
+    def add(self, pair, user_id, alert_id, direction, limit):
+        key = (user_id, alert_id)
+        self.discard(user_id, alert_id)
+        book = self._books.get(pair)
+        if book is None:
+            book = self._books[pair] = {'above': _Side(), 'below': _Side()}
+        book[direction].add(limit, key)
+        self._where[key] = (pair, direction, limit)
+
+    def add_many(self, rows):
+        """Bulk load [(pair, user_id, alert_id, direction, limit)] with one sort per side"""
+        pending = {}
+        for pair, user_id, alert_id, direction, limit in rows:
+            key = (user_id, alert_id)
+            self.discard(user_id, alert_id)
+            pending.setdefault((pair, direction), []).append((limit, key))
+            self._where[key] = (pair, direction, limit)
+        for (pair, direction), entries in pending.items():
+            book = self._books.get(pair)
+            if book is None:
+                book = self._books[pair] = {'above': _Side(), 'below': _Side()}
+            book[direction].extend(entries)
+
+    def discard(self, user_id, alert_id):
+        key = (user_id, alert_id)
+        where = self._where.pop(key, None)
+        if where is None:
+            return False
+        pair, direction, limit = where
+        book = self._books[pair]
+        book[direction].remove(limit, key)
+        if not book['above'].limits and not book['below'].limits:
+            del self._books[pair]
+        return True
+
+    def crossed(self, pair, price):
+        """[(user_id, alert_id)] of every alert on `pair` whose condition holds at `price`"""
+        book = self._books.get(pair)
+        if book is None:
+            return []
+        above, below = book['above'], book['below']
+        return above.ids[:bisect_right(above.limits, price)] + below.ids[bisect_left(below.limits, price):]
+
+    def band(self, pair, price):
+        """(low, high) such that no price strictly between crosses anything on `pair`,
+        or None if something is crossed at `price` itself"""
+        book = self._books.get(pair)
+        if book is None:
+            return -math.inf, math.inf
+        above, below = book['above'].limits, book['below'].limits
+        if (above and above[0] <= price) or (below and below[-1] >= price):
+            return None
+        return below[-1] if below else -math.inf, above[0] if above else math.inf
+
+    def nearest(self, pair, price):
+        """Distance from `price` to the closest limit on `pair` not yet crossed (None if none)"""
+        book = self._books.get(pair)
+        if book is None:
+            return None
+        above, below = book['above'], book['below']
+        gaps = []
+        i = bisect_right(above.limits, price)
+        if i < len(above.limits):
+            gaps.append(above.limits[i] - price)
+        j = bisect_left(below.limits, price)
+        if j > 0:
+            gaps.append(price - below.limits[j - 1])
+        return min(gaps) if gaps else None
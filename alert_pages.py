@@ -0,0 +1,110 @@
+import os
+from collections import OrderedDict
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from triggers import ARMED, FIRED
+
+PAGE_SIZE = int(os.getenv('ALERTS_PAGE_SIZE', '8'))  # 8 alerts = 16 button rows, well inside Telegram's limits
+PAGE_CACHE_USERS = int(os.getenv('PAGE_CACHE_USERS', '10000'))  # users whose rendered pages are kept
+
+
+def status_of(alert):
+    if alert.get('muted', False):
+        return "🔇 MUTED"
+    if alert.get('state', ARMED) == FIRED:
+        return "✅ FIRED"
+    return "🔔 ACTIVE"
+
+
+def venue(alert):
+    """EXCHANGE, or EXCHANGE/EXCHANGE_B for a spread alert"""
+    if alert.get('exchange_b'):
+        return f"{alert['exchange'].upper()}/{alert['exchange_b'].upper()}"
+    return alert['exchange'].upper()
+
+
+def target(alert):
+    if alert.get('exchange_b'):
+        return f"SPREAD > {alert['limit']:,.2f}%"
+    return f"{alert['direction'].upper()} ${alert['limit']:,.2f}"
+
+
+def quote(alert, price):
+    """A trigger price, or the spread in % for a spread alert"""
+    return f"{price:,.2f}%" if alert.get('exchange_b') else f"${price:,.2f}"
+
+
+class AlertPages:
+    """manage_alerts pages, rendered once and cached per user.
+
+    A user's alert ids are snapshotted into a list the first time a page is
+    asked for, and each page is rendered from its slice only, so showing a
+    page costs the same however many alerts the user has. `invalidate` drops
+    everything cached for a user; call it whenever their alerts change.
+    """
+
+    def __init__(self, alerts, page_size=PAGE_SIZE, max_users=PAGE_CACHE_USERS):
+        self.alerts = alerts
+        self.page_size = page_size
+        self.max_users = max_users
+        self._cache = OrderedDict()  # user_id -> ([alert_id], {page: (text, markup)}), least recent first
+        self._current = {}  # user_id -> page last shown
+
+    def invalidate(self, user_id):
+        self._cache.pop(user_id, None)
+
+    def current(self, user_id):
+        return self._current.get(user_id, 0)
+
+    def _entry(self, user_id):
+        entry = self._cache.get(user_id)
+        if entry is None:
+            entry = self._cache[user_id] = (list(self.alerts[user_id]), {})
+            if len(self._cache) > self.max_users:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(user_id)
+        return entry
+
+    def render(self, user_id, page=0):
+        """(text, markup) of one page, page number clamped; None if the user has no alerts"""
+        ids, pages = self._entry(user_id)
+        if not ids:
+            return None
+        count = (len(ids) + self.page_size - 1) // self.page_size
+        page = min(max(page, 0), count - 1)
+        self._current[user_id] = page
+        if page not in pages:
+            pages[page] = self._render(user_id, ids, page, count)
+        return pages[page]
+
+    def _render(self, user_id, ids, page, count):
+        user_alerts = self.alerts[user_id]
+        text = f"📋 **MANAGE YOUR ALERTS** ({len(ids)}):\n\n"
+        keyboard = []
+        for aid in ids[page * self.page_size:(page + 1) * self.page_size]:
+            alert = user_alerts.get(aid)
+            if alert is None:
+                continue
+            text += f"• `{venue(alert)}` `{alert['symbol']}` `{target(alert)}` `{status_of(alert)}`\n"
+            keyboard.extend([
+                [
+                    InlineKeyboardButton(text=f"🛑 STOP {alert['symbol'][:8]}", callback_data=f"stop_{aid}"),
+                    InlineKeyboardButton(text=f"🔄 {alert['symbol'][:8]}", callback_data=f"resume_{aid}")
+                ],
+                [
+                    InlineKeyboardButton(text=f"✏️ EDIT {alert['symbol'][:8]}", callback_data=f"edit_{aid}"),
+                    InlineKeyboardButton(text=f"🗑️ DEL {alert['symbol'][:8]}", callback_data=f"delete_{aid}")
+                ]
+            ])
+        if count > 1:
+            nav = []
+            if page > 0:
+                nav.append(InlineKeyboardButton(text="◀️ Prev", callback_data=f"page_{page - 1}"))
+            nav.append(InlineKeyboardButton(text=f"{page + 1}/{count}", callback_data=f"page_{page}"))
+            if page < count - 1:
+                nav.append(InlineKeyboardButton(text="Next ▶️", callback_data=f"page_{page + 1}"))
+            keyboard.append(nav)
+        keyboard.append([InlineKeyboardButton(text="🔙 Main Menu", callback_data="start_menu")])
+        return text, InlineKeyboardMarkup(inline_keyboard=keyboard)
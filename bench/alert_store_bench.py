@@ -0,0 +1,110 @@
+"""Memory per alert and evaluations/sec: dict model vs ThresholdIndex vs ColumnarAlertStore.
+
+    python -m bench.alert_store_bench --alerts 1000000 --pairs 500
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+
+from alert_index import ThresholdIndex
+from columnar_store import ColumnarAlertStore
+
+EXCHANGES = ['binance', 'bybit', 'htx', 'kucoin', 'gateio', 'bitmart']
+
+
+def make_rows(n, users, pairs, seed=1):
+    rnd = random.Random(seed)
+    universe = [(EXCHANGES[i % len(EXCHANGES)], f"SYM{i}USDT") for i in range(pairs)]
+    rows = []
+    for i in range(n):
+        pair = universe[rnd.randrange(pairs)]
+        direction = 'above' if rnd.random() < 0.5 else 'below'
+        # Alerts are set on the far side of the current price (~100)
+        limit = round(rnd.uniform(100, 150) if direction == 'above' else rnd.uniform(50, 100), 2)
+        rows.append((pair, rnd.randrange(users), f"{pair[0]}_{pair[1]}_{direction}_{i}", direction, limit))
+    return universe, rows
+
+
+def build_dicts(rows):
+    alerts = defaultdict(dict)
+    for (exchange, symbol), user_id, alert_id, direction, limit in rows:
+        alerts[user_id][alert_id] = {'exchange': exchange, 'symbol': symbol, 'limit': limit,
+                                     'direction': direction, 'muted': False}
+    return alerts
+
+
+def eval_dicts(alerts, prices):
+    hits = []
+    for user_id, user_alerts in alerts.items():
+        for alert_id, alert in user_alerts.items():
+            if alert.get('muted', False):
+                continue
+            price = prices.get((alert['exchange'], alert['symbol']))
+            if price:
+                direction = alert['direction']
+                limit = alert['limit']
+                if (direction == 'above' and price >= limit) or (direction == 'below' and price <= limit):
+                    hits.append((user_id, alert_id))
+    return hits
+
+
+def eval_index(index, prices):
+    hits = []
+    for pair, price in prices.items():
+        hits.extend(index.crossed(pair, price))
+    return hits
+
+
+def measure(label, build, evaluate, rows, ticks):
+    gc.collect()
+    tracemalloc.start()
+    store = build(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    started = time.perf_counter()
+    hits = 0
+    for prices in ticks:
+        hits += len(evaluate(store, prices))
+    elapsed = time.perf_counter() - started
+    evals = len(rows) * len(ticks)
+    print(f"{label:<10} {size / len(rows):8.1f} B/alert   {evals / elapsed:14,.0f} evals/s   "
+          f"{elapsed / len(ticks) * 1000:8.2f} ms/tick   {hits:,} hits")
+    return store, size / len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--alerts', type=int, default=200000)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--pairs', type=int, default=300)
+    parser.add_argument('--ticks', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    universe, rows = make_rows(args.alerts, args.users, args.pairs)
+    rnd = random.Random(2)
+    # A few percent of alerts sit within one move of the price, like a busy market
+    ticks = [{pair: rnd.gauss(100, 3) for pair in universe} for _ in range(args.ticks)]
+    print(f"{args.alerts:,} alerts, {args.users:,} users, {args.pairs} pairs, {args.ticks} ticks")
+
+    def build_index(rows):
+        index = ThresholdIndex()
+        index.add_many(rows)
+        return index
+
+    def build_columns(rows):
+        store = ColumnarAlertStore()
+        store.add_many(rows)
+        return store
+
+    _, dict_size = measure('dict', build_dicts, eval_dicts, rows, ticks)
+    measure('index', build_index, eval_index, rows, ticks)
+    store, size = measure('columnar', build_columns, lambda store, prices: store.evaluate(prices), rows, ticks)
+    print(f"columnar uses {1 - size / dict_size:.0%} less memory per alert than the dict model; "
+          f"columns alone: {store.nbytes() / len(rows):.1f} B/alert")
+
+
+if __name__ == '__main__':
+    main()
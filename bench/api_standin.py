@@ -0,0 +1,206 @@
+"""Local stand-in for the six exchanges' REST tickers and the Telegram Bot API.
+
+    python -m bench.api_standin --port 8766 --symbols BTCUSDT,ETHUSDT --latency 0.05 --error-rate 0.01
+    REST_URL_BINANCE=http://127.0.0.1:8766/binance TELEGRAM_API=http://127.0.0.1:8766/telegram python bot.py
+
+Prices random-walk every --interval seconds. Exchange routes answer in each
+exchange's own format (bulk and single-symbol), after --latency seconds, with
+an HTTP 500 for --error-rate of requests and a 429 past --rate-limit requests/s
+per exchange. The Telegram side answers getMe / getUpdates / sendMessage and
+records every message it is sent.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+from exchanges import BULK_URLS, canonical_symbol, wire_symbol
+from ratelimit import TokenBucket
+
+EXCHANGES = list(BULK_URLS)
+
+
+class Market:
+    """Random-walk prices for a fixed set of canonical symbols"""
+
+    def __init__(self, symbols, start_price=100.0, volatility=0.001, seed=1):
+        self.prices = {canonical_symbol(s): start_price for s in symbols}
+        self.volatility = volatility
+        self.rnd = random.Random(seed)
+        self.on_serve = None  # callback(exchange, {symbol: price}) for every response sent
+
+    def step(self):
+        for symbol in self.prices:
+            self.prices[symbol] *= 1 + self.rnd.gauss(0, self.volatility)
+
+    def quote(self, exchange, symbol=None):
+        """{canonical symbol: price} for a bulk call, or just the one asked for"""
+        if symbol is None:
+            served = dict(self.prices)
+        else:
+            symbol = canonical_symbol(symbol)
+            served = {symbol: self.prices[symbol]} if symbol in self.prices else {}
+        if self.on_serve:
+            self.on_serve(exchange, served)
+        return served
+
+
+def render(exchange, prices, single):
+    """A ticker response body in the exchange's format"""
+    rows = [(wire_symbol(exchange, s), f"{p:.8f}") for s, p in prices.items()]
+    if exchange == 'binance':
+        if single:
+            return {'symbol': rows[0][0], 'price': rows[0][1]}
+        return [{'symbol': w, 'price': p} for w, p in rows]
+    if exchange == 'bybit':
+        return {'retCode': 0, 'result': {'category': 'spot', 'list': [{'symbol': w, 'lastPrice': p} for w, p in rows]}}
+    if exchange == 'htx':
+        if single:
+            return {'status': 'ok', 'tick': {'close': float(rows[0][1])}} if rows else {'status': 'error'}
+        return {'status': 'ok', 'data': [{'symbol': w, 'close': float(p)} for w, p in rows]}
+    if exchange == 'kucoin':
+        if single:
+            return {'code': '200000', 'data': {'price': rows[0][1]} if rows else None}
+        return {'code': '200000', 'data': {'ticker': [{'symbol': w, 'last': p} for w, p in rows]}}
+    if exchange == 'gateio':
+        return [{'currency_pair': w, 'last': p} for w, p in rows]
+    return {'code': 1000, 'data': {'tickers': [{'symbol': w, 'last_price': p} for w, p in rows]}}
+
+
+# Instrument list paths (what catalog.py loads) and the rows they answer with
+INSTRUMENT_PATHS = {'binance': 'api/v3/exchangeInfo', 'bybit': 'v5/market/instruments-info',
+                    'htx': 'v1/common/symbols', 'kucoin': 'api/v2/symbols',
+                    'gateio': 'api/v4/spot/currency_pairs', 'bitmart': 'spot/v1/symbols/details'}
+
+
+def render_instruments(exchange, symbols):
+    wires = [wire_symbol(exchange, s) for s in symbols]
+    if exchange == 'binance':
+        return {'symbols': [{'symbol': w, 'status': 'TRADING'} for w in wires]}
+    if exchange == 'bybit':
+        return {'retCode': 0, 'result': {'list': [{'symbol': w, 'status': 'Trading'} for w in wires]}}
+    if exchange == 'htx':
+        return {'status': 'ok', 'data': [{'symbol': w, 'state': 'online'} for w in wires]}
+    if exchange == 'kucoin':
+        return {'code': '200000', 'data': [{'symbol': w, 'enableTrading': True} for w in wires]}
+    if exchange == 'gateio':
+        return [{'id': w, 'trade_status': 'tradable'} for w in wires]
+    return {'code': 1000, 'data': {'symbols': [{'symbol': w, 'trade_status': 'trading'} for w in wires]}}
+
+
+# Query parameter naming the symbol on each exchange's single-ticker call
+SYMBOL_PARAMS = {'binance': 'symbol', 'bybit': 'symbol', 'htx': 'symbol', 'kucoin': 'symbol',
+                 'gateio': 'currency_pair', 'bitmart': 'symbol'}
+
+
+async def ticker(request):
+    app = request.app
+    cfg = app['cfg']
+    exchange = request.match_info['exchange']
+    if exchange not in SYMBOL_PARAMS:
+        raise web.HTTPNotFound()
+    if request.match_info['path'] == INSTRUMENT_PATHS[exchange]:
+        app['requests'][(exchange, 'instruments')] += 1
+        return web.json_response(render_instruments(exchange, app['market'].prices))
+    symbol = request.query.get(SYMBOL_PARAMS[exchange])
+    kind = 'single' if symbol else 'bulk'
+    app['requests'][(exchange, kind)] += 1
+    if cfg.latency:
+        await asyncio.sleep(random.expovariate(1 / cfg.latency))
+    if cfg.rate_limit and not app['buckets'][exchange].try_acquire():
+        app['requests'][(exchange, '429')] += 1
+        return web.json_response({'msg': 'Too many requests'}, status=429)
+    if cfg.error_rate and random.random() < cfg.error_rate:
+        app['requests'][(exchange, '500')] += 1
+        return web.json_response({'msg': 'Internal error'}, status=500)
+    prices = app['market'].quote(exchange, symbol)
+    if exchange == 'binance' and symbol and not prices:
+        return web.json_response({'code': -1121, 'msg': 'Invalid symbol.'}, status=400)
+    return web.json_response(render(exchange, prices, bool(symbol)))
+
+
+def _message(chat_id, text, message_id):
+    return {'message_id': message_id, 'date': int(time.time()), 'text': text,
+            'chat': {'id': chat_id, 'type': 'private'}}
+
+
+async def telegram(request):
+    app = request.app
+    cfg = app['cfg']
+    method = request.match_info['method']
+    data = dict(await request.post()) if request.can_read_body else {}
+    data.update(request.query)
+    app['requests'][('telegram', method)] += 1
+    if method == 'getMe':
+        return web.json_response({'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'bench',
+                                                         'username': 'bench_bot'}})
+    if method == 'getUpdates':
+        # Long poll with nothing to deliver
+        await asyncio.sleep(min(float(data.get('timeout') or 0), 1.0))
+        return web.json_response({'ok': True, 'result': []})
+    if method == 'sendMessage':
+        if cfg.telegram_latency:
+            await asyncio.sleep(random.expovariate(1 / cfg.telegram_latency))
+        chat_id = int(data['chat_id'])
+        markup = json.loads(data.get('reply_markup') or '{}')
+        alert_ids = [b['callback_data'][len('stop_'):] for row in markup.get('inline_keyboard', [])
+                     for b in row if b.get('callback_data', '').startswith('stop_')]
+        app['messages'].append((time.time(), chat_id, alert_ids))
+        return web.json_response({'ok': True, 'result': _message(chat_id, data.get('text', ''), len(app['messages']))})
+    return web.json_response({'ok': True, 'result': True})
+
+
+async def _walk(app):
+    cfg = app['cfg']
+    while True:
+        await asyncio.sleep(cfg.interval)
+        app['market'].step()
+
+
+async def _start_walk(app):
+    app['walk'] = asyncio.create_task(_walk(app))
+
+
+async def _stop_walk(app):
+    app['walk'].cancel()
+
+
+def make_app(cfg, market=None):
+    app = web.Application()
+    app['cfg'] = cfg
+    app['market'] = market or Market(cfg.symbols.split(','), cfg.start_price, cfg.volatility)
+    app['buckets'] = {ex: TokenBucket(cfg.rate_limit) for ex in EXCHANGES} if cfg.rate_limit else {}
+    app['requests'] = Counter()  # (exchange | 'telegram', kind | method) -> count
+    app['messages'] = []  # (received at, chat_id, [alert_id])
+    app.router.add_route('*', '/telegram/{token}/{method}', telegram)
+    app.router.add_get('/{exchange}/{path:.*}', ticker)
+    app.on_startup.append(_start_walk)
+    app.on_cleanup.append(_stop_walk)
+    return app
+
+
+def add_arguments(parser):
+    parser.add_argument('--interval', type=float, default=0.5, help='seconds between price steps')
+    parser.add_argument('--volatility', type=float, default=0.001, help='stdev of one price step')
+    parser.add_argument('--start-price', type=float, default=100.0)
+    parser.add_argument('--latency', type=float, default=0.02, help='mean exchange response delay (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered 500')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='requests/s per exchange before 429 (0 = none)')
+    parser.add_argument('--telegram-latency', type=float, default=0.03, help='mean sendMessage delay (s)')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--symbols', default='BTCUSDT,ETHUSDT,SOLUSDT')
+    add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    cfg = parse_args()
+    web.run_app(make_app(cfg), host='127.0.0.1', port=cfg.port)
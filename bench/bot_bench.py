@@ -0,0 +1,218 @@
+"""End-to-end bot.py benchmark against local stand-ins for the exchanges and Telegram.
+
+    python -m bench.bot_bench --users 2000 --alerts-per-user 50 --pairs 200 --duration 60
+
+Writes users x alerts into a temporary alerts.db, starts bench.api_standin in
+this process and bot.py as a child pointed at it (REST_URL_*, TELEGRAM_API),
+then reports tick throughput, trigger-to-send latency, request counts and the
+bot's peak RSS. The stand-in notes when it first serves a price that crosses
+each alert; the latency runs from there to the sendMessage naming that alert.
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+from alert_index import ThresholdIndex
+from bench.api_standin import EXCHANGES, Market, add_arguments, make_app
+from storage import UPSERT, connect, migrate, to_row
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_USER = 100000
+
+
+def make_alerts(users, per_user, symbols, start_price, spread, seed=1):
+    """[(user_id, alert_id, alert)] with limits within `spread` of the start price"""
+    rnd = random.Random(seed)
+    rows = []
+    for user_id in range(FIRST_USER, FIRST_USER + users):
+        for i in range(per_user):
+            exchange, symbol = rnd.choice(EXCHANGES), rnd.choice(symbols)
+            direction = 'above' if rnd.random() < 0.5 else 'below'
+            offset = rnd.uniform(0.0005, spread)
+            limit = round(start_price * (1 + offset if direction == 'above' else 1 - offset), 4)
+            alert_id = f"{exchange}_{symbol}_{direction}_{i}"
+            rows.append((user_id, alert_id, {'exchange': exchange, 'symbol': symbol, 'limit': limit,
+                                             'direction': direction, 'muted': False, 'state': 'armed'}))
+    return rows
+
+
+def write_db(path, rows):
+    conn = connect(path)
+    migrate(conn)
+    with conn:
+        conn.executemany(UPSERT, [to_row(*row) for row in rows])
+    conn.close()
+
+
+def watch_crossings(market, rows):
+    """Record when the stand-in first serves a price crossing each alert"""
+    index = ThresholdIndex()
+    index.add_many([((a['exchange'], a['symbol']), uid, aid, a['direction'], a['limit']) for uid, aid, a in rows])
+    crossed_at = {}
+
+    def on_serve(exchange, prices):
+        now = time.time()
+        for symbol, price in prices.items():
+            for key in index.crossed((exchange, symbol), price):
+                crossed_at[key] = now
+                index.discard(*key)
+
+    market.on_serve = on_serve
+    return crossed_at
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def parse_metrics(text, metrics=None):
+    """{metric name: {label string: value}} from Prometheus text, summed into `metrics`"""
+    metrics = {} if metrics is None else metrics
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        series, value = line.rsplit(' ', 1)
+        name, _, labels = series.partition('{')
+        series = metrics.setdefault(name, {})
+        labels = labels.rstrip('}')
+        series[labels] = series.get(labels, 0) + float(value)
+    return metrics
+
+
+def total(metrics, name):
+    return sum(metrics.get(name, {}).values())
+
+
+def bucket_quantile(metrics, name, q):
+    """Upper bucket bound holding the q-th quantile of a histogram"""
+    buckets = sorted((float(labels.split('"')[1]), n) for labels, n in metrics.get(f"{name}_bucket", {}).items())
+    if not buckets or not buckets[-1][1]:
+        return None
+    for bound, n in buckets:
+        if n >= q * buckets[-1][1]:
+            return bound
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float('nan')
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024  # bytes on macOS, KiB on Linux
+
+
+async def run(args):
+    symbols = [f"SYM{i}USDT" for i in range(args.pairs)]
+    rows = make_alerts(args.users, args.alerts_per_user, symbols, args.start_price, args.spread)
+    tmp = tempfile.mkdtemp(prefix='alertbench-')
+    db_path = os.path.join(tmp, 'alerts.db')
+    write_db(db_path, rows)
+
+    market = Market(symbols, args.start_price, args.volatility)
+    crossed_at = watch_crossings(market, rows)
+    app = make_app(args, market)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    port = free_port()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    base = f"http://127.0.0.1:{port}"
+
+    metrics_port = free_port()
+    env = dict(os.environ,
+               TELEGRAM_BOT_TOKEN='123456:bench', TELEGRAM_API=f"{base}/telegram", ALERTS_DB=db_path,
+               CATALOG_PATH=os.path.join(tmp, 'symbols.json'),
+               STREAMING='0', SNAPSHOT_MODE='1' if args.snapshot else '0', ALERT_ENGINE=args.engine,
+               MONITOR_SHARDS=str(args.shards),
+               METRICS_HOST='127.0.0.1', METRICS_PORT=str(metrics_port),
+               **{f"REST_URL_{ex.upper()}": f"{base}/{ex}" for ex in EXCHANGES})
+    log_path = os.path.join(tmp, 'bot.log')
+    print(f"{len(rows):,} alerts ({args.users:,} users x {args.alerts_per_user}), {args.pairs} symbols "
+          f"x {len(EXCHANGES)} exchanges, {args.duration:.0f}s; db and bot log in {tmp}")
+    with open(log_path, 'wb') as log:
+        proc = await asyncio.create_subprocess_exec(sys.executable, 'bot.py', cwd=ROOT, env=env,
+                                                    stdout=log, stderr=log)
+        started = time.monotonic()
+        await asyncio.sleep(args.duration)
+        metrics = {}
+        async with aiohttp.ClientSession() as http:
+            # Shard workers serve their own /metrics on the following ports
+            for port in range(metrics_port, metrics_port + 1 + args.shards):
+                try:
+                    async with http.get(f"http://127.0.0.1:{port}/metrics") as resp:
+                        parse_metrics(await resp.text(), metrics)
+                except aiohttp.ClientError as e:
+                    print(f"could not scrape metrics on :{port} ({e}); see {log_path}")
+        elapsed = time.monotonic() - started
+        if proc.returncode is not None:
+            print(f"bot.py exited early with status {proc.returncode}; see {log_path}")
+        else:
+            proc.send_signal(signal.SIGINT)
+        try:
+            await asyncio.wait_for(proc.wait(), 10)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+    await runner.cleanup()
+    report(args, app, metrics, crossed_at, elapsed)
+
+
+def report(args, app, metrics, crossed_at, elapsed):
+    ticks = total(metrics, 'monitor_tick_seconds_count')
+    tick_time = total(metrics, 'monitor_tick_seconds_sum')
+    print(f"\nticks            {ticks:,.0f} ({ticks / elapsed:.2f}/s), "
+          f"mean {tick_time / max(ticks, 1) * 1000:.1f} ms, "
+          f"p95 <= {(bucket_quantile(metrics, 'monitor_tick_seconds', 0.95) or 0) * 1000:.0f} ms")
+    print(f"evaluation       {total(metrics, 'alert_eval_seconds_sum') / max(ticks, 1) * 1000:.2f} ms/tick")
+
+    delivered = {}
+    for received, chat_id, alert_ids in app['messages']:
+        for alert_id in alert_ids:
+            key = (chat_id, alert_id)
+            if key in crossed_at and key not in delivered:
+                delivered[key] = received - crossed_at[key]
+    latencies = sorted(delivered.values())
+    print(f"triggers         {len(crossed_at):,} crossings served, {total(metrics, 'alert_triggers_total'):,.0f} fired, "
+          f"{len(latencies):,} delivered in {len(app['messages']):,} messages")
+    if latencies:
+        print("trigger->send    " + ', '.join(f"p{int(q * 100)} {percentile(latencies, q) * 1000:.0f} ms"
+                                              for q in (0.5, 0.9, 0.99)) + f", max {latencies[-1] * 1000:.0f} ms")
+    print(f"telegram         {total(metrics, 'telegram_send_failures_total'):,.0f} failed sends, "
+          f"{total(metrics, 'telegram_429_total'):,.0f} 429s")
+
+    requests = app['requests']
+    print("requests         " + ', '.join(
+        f"{ex} {requests[(ex, 'bulk')] + requests[(ex, 'single')]:,}"
+        + (f" ({requests[(ex, '429')]} x429, {requests[(ex, '500')]} x500)" if requests[(ex, '429')] or requests[(ex, '500')] else '')
+        for ex in EXCHANGES))
+    print(f"peak RSS         {peak_rss_mb():.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--alerts-per-user', type=int, default=20)
+    parser.add_argument('--pairs', type=int, default=100, help='symbols listed on every exchange')
+    parser.add_argument('--spread', type=float, default=0.02, help='alert limits within this fraction of the price')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to run the bot')
+    parser.add_argument('--engine', default='index', choices=['index', 'columnar'])
+    parser.add_argument('--snapshot', type=int, default=1, help='1 = bulk tickers, 0 = one call per symbol')
+    parser.add_argument('--shards', type=int, default=0, help='monitor worker processes (MONITOR_SHARDS)')
+    add_arguments(parser)
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Local stand-in for the six exchanges' public ticker WebSockets.
+
+    python -m bench.ws_standin --port 8765
+    WS_URL_BINANCE=ws://127.0.0.1:8765/ws/binance STREAMING=1 python bot.py
+
+Every subscribed symbol gets a random-walk price pushed every --interval seconds.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import random
+
+from aiohttp import web
+
+
+def parse_request(exchange, msg):
+    """-> ('sub' | 'unsub' | 'ping' | None, [wire symbols])"""
+    if msg == 'ping':
+        return 'ping', []
+    if not isinstance(msg, dict):
+        return None, []
+    if exchange == 'binance':
+        kind = {'SUBSCRIBE': 'sub', 'UNSUBSCRIBE': 'unsub'}.get(msg.get('method'))
+        return kind, [p.split('@')[0].upper() for p in msg.get('params', [])]
+    if exchange in ('bybit', 'bitmart'):
+        kind = {'subscribe': 'sub', 'unsubscribe': 'unsub', 'ping': 'ping'}.get(msg.get('op'))
+        return kind, [a.split('.' if exchange == 'bybit' else ':', 1)[1] for a in msg.get('args', [])]
+    if exchange == 'htx':
+        if 'pong' in msg:
+            return None, []
+        if 'sub' in msg:
+            return 'sub', [msg['sub'].split('.')[1]]
+        if 'unsub' in msg:
+            return 'unsub', [msg['unsub'].split('.')[1]]
+    if exchange == 'kucoin':
+        kind = {'subscribe': 'sub', 'unsubscribe': 'unsub', 'ping': 'ping'}.get(msg.get('type'))
+        return kind, msg.get('topic', ':').split(':', 1)[1].split(',') if kind != 'ping' else []
+    if exchange == 'gateio':
+        if msg.get('channel') == 'spot.ping':
+            return 'ping', []
+        kind = {'subscribe': 'sub', 'unsubscribe': 'unsub'}.get(msg.get('event'))
+        return kind, msg.get('payload', [])
+    return None, []
+
+
+def pong(exchange, msg):
+    if exchange == 'bitmart':
+        return 'pong'
+    if exchange == 'bybit':
+        return {'op': 'pong'}
+    if exchange == 'kucoin':
+        return {'id': msg.get('id'), 'type': 'pong'}
+    return {'channel': 'spot.pong'}
+
+
+def frame(exchange, wire, price):
+    if exchange == 'binance':
+        return {'e': '24hrMiniTicker', 's': wire, 'c': f"{price:.8f}"}
+    if exchange == 'bybit':
+        return {'topic': f"tickers.{wire}", 'data': {'symbol': wire, 'lastPrice': f"{price:.8f}"}}
+    if exchange == 'htx':
+        return {'ch': f"market.{wire}.ticker", 'tick': {'close': price}}
+    if exchange == 'kucoin':
+        return {'type': 'message', 'topic': f"/market/ticker:{wire}", 'data': {'price': f"{price:.8f}"}}
+    if exchange == 'gateio':
+        return {'channel': 'spot.tickers', 'event': 'update', 'result': {'currency_pair': wire, 'last': f"{price:.8f}"}}
+    return {'table': 'spot/ticker', 'data': [{'symbol': wire, 'last_price': f"{price:.8f}"}]}
+
+
+async def send(ws, exchange, payload):
+    if exchange == 'htx':
+        await ws.send_bytes(gzip.compress(json.dumps(payload).encode()))
+    elif isinstance(payload, str):
+        await ws.send_str(payload)
+    else:
+        await ws.send_json(payload)
+
+
+async def ticker_socket(request):
+    exchange = request.match_info['exchange']
+    cfg = request.app['cfg']
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    prices = {}
+
+    async def pump():
+        while not ws.closed:
+            await asyncio.sleep(cfg.interval)
+            for wire in list(prices):
+                prices[wire] *= 1 + random.gauss(0, cfg.volatility)
+                await send(ws, exchange, frame(exchange, wire, prices[wire]))
+
+    task = asyncio.create_task(pump())
+    try:
+        async for msg in ws:
+            data = msg.data
+            try:
+                data = json.loads(data)
+            except ValueError:
+                pass
+            kind, wires = parse_request(exchange, data)
+            if kind == 'ping':
+                await send(ws, exchange, pong(exchange, data))
+            elif kind == 'sub':
+                for wire in wires:
+                    prices.setdefault(wire, cfg.start_price)
+            elif kind == 'unsub':
+                for wire in wires:
+                    prices.pop(wire, None)
+            if cfg.drop_after and random.random() < 1 / cfg.drop_after:
+                break  # simulate the exchange dropping us
+    finally:
+        task.cancel()
+    return ws
+
+
+def make_app(cfg):
+    app = web.Application()
+    app['cfg'] = cfg
+    app.router.add_get('/ws/{exchange}', ticker_socket)
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--interval', type=float, default=0.2)
+    parser.add_argument('--volatility', type=float, default=0.002)
+    parser.add_argument('--start-price', type=float, default=100000.0)
+    parser.add_argument('--drop-after', type=int, default=0,
+                        help='drop a connection on average every N client messages (0 = never)')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    cfg = parse_args()
+    web.run_app(make_app(cfg), host='127.0.0.1', port=cfg.port)
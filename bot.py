@@ -1,31 +1,53 @@
 import asyncio
-import aiohttp
 import logging
-import json
 from aiogram import Bot, Dispatcher, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
 import os
+import time
 from collections import defaultdict
-import sqlite3
+from sessions import SessionManager
+from catalog import SymbolCatalog
+from alert_pages import AlertPages, quote, target, venue
+from exchanges import get_price
+from fetcher import FetchScheduler
+from notifier import Notifier
+from spreads import is_spread
+from storage import AlertStore
+from metrics import Gauge, PROFILER, TRIGGERS, start_server
+from monitor import Monitor
+from shards import MONITOR_SHARDS, SHARD_LIMITS, ShardedMonitor
+from webhook import WEBHOOK, run_webhook
+from triggers import ARMED, rearm
 
 logging.basicConfig(level=logging.INFO)
 BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
-bot = Bot(token=BOT_TOKEN)
+# TELEGRAM_API: alternative Bot API root (a local Bot API server, or bench/api_standin.py)
+TELEGRAM_API = os.getenv('TELEGRAM_API')
+bot = Bot(token=BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API)) if TELEGRAM_API else None)
 dp = Dispatcher(storage=MemoryStorage())
 
 EXCHANGES = ['binance', 'bybit', 'htx', 'kucoin', 'gateio', 'bitmart']
-
-conn = sqlite3.connect('alerts.db', check_same_thread=False)
-cursor = conn.cursor()
-cursor.execute('''CREATE TABLE IF NOT EXISTS alerts 
-                  (user_id INTEGER, alert_id TEXT PRIMARY KEY, data TEXT, muted BOOLEAN DEFAULT 0)''')
-conn.commit()
+DB_PATH = os.getenv('ALERTS_DB', 'alerts.db')
 
 alerts = defaultdict(dict)
+pages = AlertPages(alerts)  # manage_alerts pages, cached until the user's alerts change
+catalog = SymbolCatalog()  # listed symbols per exchange, for validating new alerts
+store = None  # AlertStore, created in main(); writes are batched off the event loop
+sessions = None  # SessionManager, created in main()
+fetcher = FetchScheduler(SHARD_LIMITS)  # concurrent across exchanges, rate-limited per exchange (its share when sharded)
+notifier = None  # Notifier, created in main(); evaluation never waits on Telegram
+# Monitor in this process, or ShardedMonitor over MONITOR_SHARDS worker processes; created in main()
+monitor = None
+
+Gauge('notify_queue_depth', 'Users waiting for a Telegram delivery', fn=lambda: {(): notifier.queue.qsize() if notifier else 0})
+Gauge('notify_dropped', 'Triggers dropped because the delivery queue was full', fn=lambda: {(): notifier.dropped if notifier else 0})
 
 class AlertForm(StatesGroup):
     exchange = State()
@@ -33,104 +55,98 @@ class AlertForm(StatesGroup):
     limit = State()
     direction = State()
 
+class SpreadForm(StatesGroup):
+    exchange_a = State()
+    exchange_b = State()
+    symbol = State()
+    limit = State()
+
 class EditForm(StatesGroup):
     new_limit = State()
     edit_alert_id = State()
 
 async def load_alerts():
-    cursor.execute('SELECT * FROM alerts')
-    for row in cursor.fetchall():
-        uid, aid, data_json, muted = row
-        alert_data = json.loads(data_json)
-        alert_data['muted'] = bool(muted)
-        alerts[uid][aid] = alert_data
-
-async def save_alert(user_id, alert_id, alert):
-    cursor.execute('INSERT OR REPLACE INTO alerts VALUES (?, ?, ?, ?)', 
-                   (user_id, alert_id, json.dumps(alert), alert.get('muted', False)))
-    conn.commit()
-
-async def get_price(exchange, symbol):
-    try:
-        async with aiohttp.ClientSession() as session:
-            if exchange == 'binance':
-                url = f"https://api.binance.com/api/v3/ticker/price?symbol={symbol.replace('/','')}"
-                async with session.get(url) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        return float(data['price'])
-            elif exchange == 'bybit':
-                url = f"https://api.bybit.com/v5/market/tickers?category=spot&symbol={symbol.replace('/','')}"
-                async with session.get(url) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if data.get('retCode') == 0 and data['result']['list']:
-                            return float(data['result']['list'][0]['lastPrice'])
-            elif exchange == 'htx':
-                url = f"https://api.huobi.pro/market/detail/merged?symbol={symbol.lower().replace('/','')}"
-                async with session.get(url) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if 'tick' in data:
-                            return float(data['tick']['close'])
-            elif exchange == 'kucoin':
-                url = f"https://api.kucoin.com/api/v1/market/orderbook/level1?symbol={symbol.replace('/','-')}"
-                async with session.get(url) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if data.get('code') == '200000':
-                            return float(data['data']['price'])
-            elif exchange == 'gateio':
-                url = f"https://api.gateio.ws/api/v4/spot/tickers?currency_pair={symbol.replace('/','_')}"
-                async with session.get(url) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        for ticker in data:
-                            if ticker['currency_pair'] == symbol.replace('/','_'):
-                                return float(ticker['last'])
-            elif exchange == 'bitmart':
-                url = f"https://api-cloud.bitmart.com/spot/v1/ticker?symbol={symbol.replace('/','_')}"
-                async with session.get(url) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if data.get('code') == '1000' and data['data']['tickers']:
-                            return float(data['data']['tickers'][0]['last_price'])
-    except:
-        return None
-
-async def price_monitor():
+    """Stream alerts in from SQLite chunk by chunk while the bot is already serving"""
+    started = time.monotonic()
+    total = 0
+    chunks = store.load()
     while True:
-        for user_id, user_alerts in list(alerts.items()):
-            for alert_id, alert in list(user_alerts.items()):
-                if alert.get('muted', False):
-                    continue
-                price = await get_price(alert['exchange'], alert['symbol'])
-                if price:
-                    direction = alert['direction']
-                    limit = alert['limit']
-                    if (direction == 'above' and price >= limit) or (direction == 'below' and price <= limit):
-                        # ALERT MESSAGE WITH STOP BUTTON
-                        keyboard = [
-                            [InlineKeyboardButton(text="🛑 STOP THIS ALERT", callback_data=f"stop_{alert_id}")],
-                            [InlineKeyboardButton(text="✏️ EDIT PRICE", callback_data=f"edit_{alert_id}")],
-                            [InlineKeyboardButton(text="🗑️ DELETE", callback_data=f"delete_{alert_id}")]
-                        ]
-                        await bot.send_message(
-                            user_id,
-                            f"🚨 **ALERT TRIGGERED!**\n\n"
-                            f"📊 `{alert['exchange'].upper()}`\n"
-                            f"💱 `{alert['symbol']}`\n"
-                            f"💰 **${price:,.2f}**\n"
-                            f"🎯 **{direction.upper()} ${limit:,.2f}**",
-                            parse_mode="Markdown",
-                            reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
-                        )
-        await asyncio.sleep(5)
+        # fetchmany runs in a thread so polling and monitoring keep going meanwhile
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+        fresh = []
+        for uid, aid, alert in chunk:
+            if aid in alerts[uid]:
+                continue  # created or changed by the user while we were loading
+            alerts[uid][aid] = alert
+            fresh.append((uid, aid, alert))
+        for uid in {uid for uid, _, _ in fresh}:
+            pages.invalidate(uid)
+        await monitor.add_many(fresh)
+        total += len(chunk)
+    monitor.loaded()
+    elapsed = time.monotonic() - started
+    logging.info(f"loaded {total:,} alerts in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+
+def alert_fired(user_id, alert_id, alert, price):
+    TRIGGERS.inc()
+    notifier.submit(user_id, alert_id, alert, price)
+
+def alert_state(user_id, alert_id, alert):
+    """The monitor moved an alert between armed and fired: keep our copy and the store in step"""
+    current = alerts[user_id].get(alert_id)
+    if current is None or current['limit'] != alert['limit']:
+        return  # deleted or edited meanwhile; the monitor already has the newer version
+    if current is not alert:
+        # From a shard worker: take over just the state it owns
+        current['state'] = alert['state']
+        if 'fired_at' in alert:
+            current['fired_at'] = alert['fired_at']
+    store.save(user_id, alert_id, current)
+    pages.invalidate(user_id)
+
+async def alert_changed(user_id, alert_id):
+    pages.invalidate(user_id)
+    await monitor.update(user_id, alert_id, alerts[user_id].get(alert_id))
+
+async def send_alerts(user_id, batch):
+    """One message (and one keyboard) for every alert of this user that fired"""
+    if len(batch) == 1:
+        alert_id, alert, price = batch[0]
+        # ALERT MESSAGE WITH STOP BUTTON
+        keyboard = [
+            [InlineKeyboardButton(text="🛑 STOP THIS ALERT", callback_data=f"stop_{alert_id}")],
+            [InlineKeyboardButton(text="✏️ EDIT PRICE", callback_data=f"edit_{alert_id}")],
+            [InlineKeyboardButton(text="🗑️ DELETE", callback_data=f"delete_{alert_id}")]
+        ]
+        text = (f"🚨 **ALERT TRIGGERED!**\n\n"
+                f"📊 `{venue(alert)}`\n"
+                f"💱 `{alert['symbol']}`\n"
+                f"💰 **{quote(alert, price)}**\n"
+                f"🎯 **{target(alert)}**")
+    else:
+        text = f"🚨 **{len(batch)} ALERTS TRIGGERED!**\n\n"
+        keyboard = []
+        for alert_id, alert, price in batch:
+            text += f"• `{venue(alert)}` `{alert['symbol']}` **{quote(alert, price)}** 🎯 `{target(alert)}`\n"
+            keyboard.append([
+                InlineKeyboardButton(text=f"🛑 {alert['symbol'][:8]}", callback_data=f"stop_{alert_id}"),
+                InlineKeyboardButton(text=f"✏️ {alert['symbol'][:8]}", callback_data=f"edit_{alert_id}"),
+                InlineKeyboardButton(text=f"🗑️ {alert['symbol'][:8]}", callback_data=f"delete_{alert_id}")
+            ])
+    await bot.send_message(
+        user_id,
+        text,
+        parse_mode="Markdown",
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
+    )
 
 @dp.message(Command('start'))
 async def start(message: types.Message):
     keyboard = [
         [InlineKeyboardButton(text="➕ New Alert", callback_data="set_alert")],
+        [InlineKeyboardButton(text="↔️ Spread Alert", callback_data="spread_alert")],
         [InlineKeyboardButton(text="🧪 Test Prices", callback_data="test_price")],
         [InlineKeyboardButton(text="📋 Manage Alerts", callback_data="manage_alerts")]
     ]
@@ -146,8 +162,9 @@ async def start(message: types.Message):
 @dp.callback_query(lambda c: c.data == "test_price")
 async def test_price(callback: CallbackQuery):
     text = "🧪 **LIVE PRICES (BTCUSDT):**\n\n"
-    for ex in EXCHANGES:
-        price = await get_price(ex, 'BTCUSDT')
+    prices = await fetcher.gather([(ex, 'single', get_price, sessions.get(ex), ex, catalog.wire(ex, 'BTCUSDT'))
+                                   for ex in EXCHANGES])
+    for ex, price in zip(EXCHANGES, prices):
         status = f"`{ex.upper()}`: **${price:,.2f}**" if price else f"`{ex.upper()}`: ❌"
         text += status + "\n"
     await callback.message.edit_text(text, parse_mode="Markdown")
@@ -182,7 +199,13 @@ async def set_exchange(callback: CallbackQuery, state: FSMContext):
 
 @dp.message(AlertForm.symbol)
 async def set_symbol(message: types.Message, state: FSMContext):
-    symbol = message.text.strip().upper()
+    exchange = (await state.get_data())['exchange']
+    symbol = catalog.lookup(exchange, message.text or '')
+    if symbol is None:
+        suggestions = catalog.suggest(exchange, message.text or '')
+        hint = ("\n\n💡 Did you mean: " + ", ".join(f"`{s}`" for s in suggestions)) if suggestions else ""
+        await message.reply(f"❌ **Not listed on {exchange.upper()}.** Enter symbol again:{hint}", parse_mode="Markdown")
+        return
     await state.update_data(symbol=symbol)
     await message.reply("💰 **Enter limit price:**\n`90000`", parse_mode="Markdown")
     await state.set_state(AlertForm.limit)
@@ -213,10 +236,12 @@ async def set_dir(callback: CallbackQuery, state: FSMContext):
         'symbol': data['symbol'], 
         'limit': data['limit'], 
         'direction': direction,
-        'muted': False
+        'muted': False,
+        'state': ARMED
     }
     alerts[user_id][alert_id] = alert
-    await save_alert(user_id, alert_id, alert)
+    store.save(user_id, alert_id, alert)
+    await alert_changed(user_id, alert_id)
     
     await callback.message.edit_text(
         f"✅ **ALERT CREATED!**\n\n"
@@ -229,33 +254,112 @@ async def set_dir(callback: CallbackQuery, state: FSMContext):
     await state.clear()
     await callback.answer()
 
+# SPREAD ALERTS: same symbol on two exchanges, fires when they diverge by more than limit %
+def exchange_keyboard(prefix, exchanges):
+    keyboard = [[InlineKeyboardButton(text=ex.upper(), callback_data=f"{prefix}_{ex}") for ex in exchanges[i:i + 2]]
+                for i in range(0, len(exchanges), 2)]
+    keyboard.append([InlineKeyboardButton(text="❌ Cancel", callback_data="start_menu")])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+@dp.callback_query(lambda c: c.data == "spread_alert")
+async def spread_alert_start(callback: CallbackQuery, state: FSMContext):
+    await callback.message.edit_text("↔️ **Select first exchange:**",
+                                     reply_markup=exchange_keyboard("spa", EXCHANGES), parse_mode="Markdown")
+    await state.set_state(SpreadForm.exchange_a)
+    await callback.answer()
+
+@dp.callback_query(SpreadForm.exchange_a, lambda c: c.data.startswith("spa_"))
+async def set_spread_exchange_a(callback: CallbackQuery, state: FSMContext):
+    ex = callback.data.split('_')[1]
+    await state.update_data(exchange=ex)
+    await callback.message.edit_text(f"✅ **{ex.upper()} selected**\n\n↔️ **Select second exchange:**",
+                                     reply_markup=exchange_keyboard("spb", [e for e in EXCHANGES if e != ex]),
+                                     parse_mode="Markdown")
+    await state.set_state(SpreadForm.exchange_b)
+    await callback.answer()
+
+@dp.callback_query(SpreadForm.exchange_b, lambda c: c.data.startswith("spb_"))
+async def set_spread_exchange_b(callback: CallbackQuery, state: FSMContext):
+    ex = callback.data.split('_')[1]
+    await state.update_data(exchange_b=ex)
+    exchange = (await state.get_data())['exchange']
+    await callback.message.edit_text(
+        f"✅ **{exchange.upper()} vs {ex.upper()}**\n\n"
+        f"💱 **Enter symbol:**\n"
+        f"`BTCUSDT`", parse_mode="Markdown")
+    await state.set_state(SpreadForm.symbol)
+    await callback.answer()
+
+@dp.message(SpreadForm.symbol)
+async def set_spread_symbol(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    symbol = None
+    for exchange in (data['exchange'], data['exchange_b']):
+        symbol = catalog.lookup(exchange, message.text or '')
+        if symbol is None:
+            suggestions = catalog.suggest(exchange, message.text or '')
+            hint = ("\n\n💡 Did you mean: " + ", ".join(f"`{s}`" for s in suggestions)) if suggestions else ""
+            await message.reply(f"❌ **Not listed on {exchange.upper()}.** Enter symbol again:{hint}", parse_mode="Markdown")
+            return
+    await state.update_data(symbol=symbol)
+    await message.reply("📐 **Enter spread in %:**\n`0.3`", parse_mode="Markdown")
+    await state.set_state(SpreadForm.limit)
+
+@dp.message(SpreadForm.limit)
+async def set_spread_limit(message: types.Message, state: FSMContext):
+    try:
+        limit = float(message.text)
+    except (TypeError, ValueError):
+        limit = 0
+    if not limit > 0:
+        await message.reply("❌ **Enter a positive number:** `0.3`", parse_mode="Markdown")
+        return
+    data = await state.get_data()
+    user_id = message.from_user.id
+    alert_id = f"{data['exchange']}-{data['exchange_b']}_{data['symbol']}_spread_{limit:g}"
+    alert = {
+        'exchange': data['exchange'],
+        'exchange_b': data['exchange_b'],
+        'symbol': data['symbol'],
+        'limit': limit,
+        'direction': 'above',
+        'muted': False,
+        'state': ARMED
+    }
+    alerts[user_id][alert_id] = alert
+    store.save(user_id, alert_id, alert)
+    await alert_changed(user_id, alert_id)
+    await message.reply(
+        f"✅ **SPREAD ALERT CREATED!**\n\n"
+        f"📊 `{venue(alert)}`\n"
+        f"💱 `{data['symbol']}`\n"
+        f"🎯 `{target(alert)}`\n\n"
+        f"📋 Click **Manage Alerts** for controls",
+        parse_mode="Markdown"
+    )
+    await state.clear()
+
 # FIXED: MANAGE ALERTS WITH INDIVIDUAL BUTTONS
-@dp.callback_query(lambda c: c.data == "manage_alerts")
-async def manage_alerts(callback: CallbackQuery):
-    user_id = callback.from_user.id
-    if not alerts[user_id]:
+async def show_alerts(callback: CallbackQuery, page=0):
+    page = pages.render(callback.from_user.id, page)
+    if page is None:
         await callback.message.edit_text("📭 **No alerts.** Create one first!")
-        await callback.answer()
         return
-    
-    text = "📋 **MANAGE YOUR ALERTS:**\n\n"
-    keyboard = []
-    for aid, alert in alerts[user_id].items():
-        status = "🔇 MUTED" if alert.get('muted', False) else "🔔 ACTIVE"
-        text += f"• `{alert['exchange'].upper()}` `{alert['symbol']}` `{alert['direction'].upper()} ${alert['limit']:,.2f}` `{status}`\n"
-        keyboard.extend([
-            [
-                InlineKeyboardButton(text=f"🛑 STOP {alert['symbol'][:8]}", callback_data=f"stop_{aid}"),
-                InlineKeyboardButton(text=f"🔄 {alert['symbol'][:8]}", callback_data=f"resume_{aid}")
-            ],
-            [
-                InlineKeyboardButton(text=f"✏️ EDIT {alert['symbol'][:8]}", callback_data=f"edit_{aid}"),
-                InlineKeyboardButton(text=f"🗑️ DEL {alert['symbol'][:8]}", callback_data=f"delete_{aid}")
-            ]
-        ])
-    keyboard.append([InlineKeyboardButton(text="🔙 Main Menu", callback_data="start_menu")])
-    reply_markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
-    await callback.message.edit_text(text, reply_markup=reply_markup, parse_mode="Markdown")
+    text, reply_markup = page
+    try:
+        await callback.message.edit_text(text, reply_markup=reply_markup, parse_mode="Markdown")
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+
+@dp.callback_query(lambda c: c.data == "manage_alerts")
+async def manage_alerts(callback: CallbackQuery):
+    await show_alerts(callback)
+    await callback.answer()
+
+@dp.callback_query(lambda c: c.data.startswith("page_"))
+async def alerts_page(callback: CallbackQuery):
+    await show_alerts(callback, int(callback.data.split("_", 1)[1]))
     await callback.answer()
 
 # FIXED: ALL INDIVIDUAL BUTTON HANDLERS
@@ -267,7 +371,8 @@ async def stop_alert(callback: CallbackQuery):
     
     if alert_id in alerts[user_id]:
         alerts[user_id][alert_id]['muted'] = True
-        await save_alert(user_id, alert_id, alerts[user_id][alert_id])
+        store.save(user_id, alert_id, alerts[user_id][alert_id])
+        await alert_changed(user_id, alert_id)
         await callback.answer(f"🛑 Alert **{alert_id}** stopped!", show_alert=True)
     else:
         await callback.answer("❌ Alert not found!")
@@ -280,7 +385,9 @@ async def resume_alert(callback: CallbackQuery):
     
     if alert_id in alerts[user_id]:
         alerts[user_id][alert_id]['muted'] = False
-        await save_alert(user_id, alert_id, alerts[user_id][alert_id])
+        rearm(alerts[user_id][alert_id])
+        store.save(user_id, alert_id, alerts[user_id][alert_id])
+        await alert_changed(user_id, alert_id)
         await callback.answer(f"🔄 Alert **{alert_id}** resumed!", show_alert=True)
     else:
         await callback.answer("❌ Alert not found!")
@@ -294,10 +401,11 @@ async def edit_alert_start(callback: CallbackQuery, state: FSMContext):
     if alert_id in alerts[user_id]:
         alert = alerts[user_id][alert_id]
         await state.update_data(alert_id=alert_id)
-        text = f"✏️ **EDIT PRICE**\n\n"
-        text += f"📊 `{alert['exchange'].upper()}` `{alert['symbol']}`\n"
-        text += f"🎯 Current: `{alert['direction'].upper()} ${alert['limit']:,.2f}`\n\n"
-        text += f"💰 **Enter NEW PRICE:**"
+        spread = is_spread(alert)
+        text = f"✏️ **EDIT SPREAD**\n\n" if spread else f"✏️ **EDIT PRICE**\n\n"
+        text += f"📊 `{venue(alert)}` `{alert['symbol']}`\n"
+        text += f"🎯 Current: `{target(alert)}`\n\n"
+        text += f"📏 **Enter NEW SPREAD %:** `0.3`" if spread else f"💰 **Enter NEW PRICE:**"
         await callback.message.edit_text(text, parse_mode="Markdown")
         await state.set_state(EditForm.new_limit)
         await callback.answer()
@@ -312,15 +420,22 @@ async def edit_limit(message: types.Message, state: FSMContext):
         alert_id = data['alert_id']
         user_id = message.from_user.id
         
+        if alert_id in alerts[user_id] and not new_limit > 0:
+            # Same rule as a new alert: a spread % or a price has to be positive
+            example = "0.3" if is_spread(alerts[user_id][alert_id]) else "90000"
+            await message.reply(f"❌ **Enter a positive number:** `{example}`", parse_mode="Markdown")
+            return
         if alert_id in alerts[user_id]:
             alerts[user_id][alert_id]['limit'] = new_limit
-            await save_alert(user_id, alert_id, alerts[user_id][alert_id])
+            rearm(alerts[user_id][alert_id])
+            store.save(user_id, alert_id, alerts[user_id][alert_id])
+            await alert_changed(user_id, alert_id)
             alert = alerts[user_id][alert_id]
             await message.reply(
-                f"✅ **PRICE UPDATED!**\n\n"
-                f"📊 `{alert['exchange'].upper()}`\n"
+                f"✅ **{'SPREAD' if is_spread(alert) else 'PRICE'} UPDATED!**\n\n"
+                f"📊 `{venue(alert)}`\n"
                 f"💱 `{alert['symbol']}`\n"
-                f"🎯 `{alert['direction'].upper()} **${new_limit:,.2f}**`\n\n"
+                f"🎯 `**{target(alert)}**`\n\n"
                 f"📋 `Manage Alerts`",
                 parse_mode="Markdown"
             )
@@ -336,10 +451,10 @@ async def delete_alert(callback: CallbackQuery):
     
     if alert_id in alerts[user_id]:
         del alerts[user_id][alert_id]
-        cursor.execute('DELETE FROM alerts WHERE user_id=? AND alert_id=?', (user_id, alert_id))
-        conn.commit()
+        store.delete(user_id, alert_id)
+        await alert_changed(user_id, alert_id)
         await callback.answer(f"🗑️ Alert **{alert_id}** deleted!", show_alert=True)
-        await manage_alerts(callback)  # Refresh list
+        await show_alerts(callback, pages.current(user_id))  # Refresh the page it was deleted from
     else:
         await callback.answer("❌ Alert not found!")
 
@@ -350,10 +465,39 @@ async def start_menu(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 async def main():
-    await load_alerts()
-    asyncio.create_task(price_monitor())
+    global store, sessions, notifier, monitor
+    store = AlertStore(DB_PATH)
+    sessions = SessionManager()
+    catalog.load_cache()
+    notifier = Notifier(send_alerts)
+    await notifier.start()
+    if MONITOR_SHARDS:
+        monitor = ShardedMonitor(MONITOR_SHARDS, alert_fired, alert_state, alerts)
+    else:
+        monitor = Monitor(sessions, fetcher, alert_fired, alert_state, alerts, wire=catalog.wire)
+    await monitor.start()
+    metrics_runner = await start_server()
+    # Polling and monitoring start right away; stored alerts stream in behind them
+    asyncio.create_task(load_alerts())
+    asyncio.create_task(catalog.run(sessions, fetcher))
     print("🚀 ULTIMATE BOT STARTED - All buttons fixed!")
-    await dp.start_polling(bot)
+    try:
+        if WEBHOOK:
+            await run_webhook(dp, bot)
+        else:
+            await bot.delete_webhook()  # getUpdates is refused while a webhook is set
+            await dp.start_polling(bot)
+    finally:
+        await monitor.close()
+        await notifier.close()
+        if WEBHOOK:
+            await bot.session.close()
+        await sessions.close()
+        store.close()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        if PROFILER.enabled:
+            logging.info("slowest ticks:\n" + PROFILER.report())
 
 if __name__ == '__main__':
     asyncio.run(main())
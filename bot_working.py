@@ -1,5 +1,4 @@
 import asyncio
-import aiohttp
 import logging
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
@@ -8,9 +7,10 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
 import os
-import json
+import time
 from collections import defaultdict
-import sqlite3
+from sessions import SessionManager
+from storage import LEGACY_EXCHANGE, AlertStore
 
 logging.basicConfig(level=logging.INFO)
 BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
@@ -25,13 +25,18 @@ COINGECKO_MAP = {
     'ADAUSDT': 'cardano'
 }
 
-conn = sqlite3.connect('alerts.db', check_same_thread=False)
-cursor = conn.cursor()
-cursor.execute('''CREATE TABLE IF NOT EXISTS alerts 
-                  (user_id INTEGER, alert_id TEXT PRIMARY KEY, data TEXT)''')
-conn.commit()
+# Same file and schema as bot.py, so either bot can run on it
+DB_PATH = os.getenv('ALERTS_DB', 'alerts.db')
+store = None  # AlertStore, created in main()
 
 alerts = defaultdict(dict)
+sessions = None  # SessionManager, created in main()
+
+# Shared price cache: monitor + test button read it, upstream is hit once per TTL
+PRICE_TTL = float(os.getenv('PRICE_TTL', '10'))  # CoinGecko only refreshes ~every minute anyway
+CG_BATCH = 100  # ids per /simple/price request
+price_cache = {}  # coingecko id -> (usd price, fetched at)
+cache_lock = asyncio.Lock()
 
 class AlertForm(StatesGroup):
     symbol = State()
@@ -39,36 +44,53 @@ class AlertForm(StatesGroup):
     direction = State()
 
 async def load_alerts():
-    cursor.execute('SELECT * FROM alerts')
-    for row in cursor.fetchall():
-        uid, aid, data_json = row
-        alerts[uid][aid] = json.loads(data_json)
+    for chunk in store.load():
+        for uid, aid, alert in chunk:
+            # Spread and muted alerts are bot.py features: leave them to it
+            if not alert.get('exchange_b') and not alert['muted']:
+                alerts[uid][aid] = alert
 
 async def save_alert(user_id, alert_id, alert):
-    cursor.execute('INSERT OR REPLACE INTO alerts VALUES (?, ?, ?)', 
-                   (user_id, alert_id, json.dumps(alert)))
-    conn.commit()
-
-async def get_coingecko_price(symbol):
-    """CoinGecko API - WORKS EVERYWHERE"""
-    try:
-        async with aiohttp.ClientSession() as session:
-            cg_symbol = COINGECKO_MAP.get(symbol, symbol.split('/')[0].lower())
-            url = f"https://api.coingecko.com/api/v3/simple/price?ids={cg_symbol}&vs_currencies=usd"
-            async with session.get(url) as resp:
-                data = await resp.json()
-                return data[cg_symbol]['usd']
-    except Exception as e:
-        logging.error(f"CoinGecko error: {e}")
-        return None
+    store.save(user_id, alert_id, alert)
+
+def coingecko_id(symbol):
+    return COINGECKO_MAP.get(symbol, symbol.split('/')[0].lower())
+
+async def get_coingecko_prices(symbols):
+    """CoinGecko API - WORKS EVERYWHERE - {symbol: usd}, batched ids + TTL cache"""
+    ids = {coingecko_id(s) for s in symbols}
+    # One refresher at a time: a burst of callers waits and then reads the cache
+    async with cache_lock:
+        now = time.monotonic()
+        stale = sorted(i for i in ids if now - price_cache.get(i, (None, float('-inf')))[1] > PRICE_TTL)
+        for start in range(0, len(stale), CG_BATCH):
+            batch = stale[start:start + CG_BATCH]
+            try:
+                session = sessions.get('coingecko')
+                url = f"https://api.coingecko.com/api/v3/simple/price?ids={','.join(batch)}&vs_currencies=usd"
+                async with session.get(url) as resp:
+                    resp.raise_for_status()  # a 429/5xx body is JSON too, but holds no prices
+                    data = await resp.json()
+                for cg_id in batch:
+                    # An id missing from the answer keeps its last good price
+                    price = (data.get(cg_id) or {}).get('usd')
+                    price_cache[cg_id] = (price if price is not None else price_cache.get(cg_id, (None,))[0], now)
+            except Exception as e:
+                logging.error(f"CoinGecko error: {e}")
+                # Keep the last good prices but don't retry this batch until the TTL is up
+                for cg_id in batch:
+                    price_cache[cg_id] = (price_cache.get(cg_id, (None,))[0], now)
+    return {s: price_cache.get(coingecko_id(s), (None,))[0] for s in symbols}
 
 async def price_monitor():
     """2s CoinGecko polling - 100% reliable"""
     while True:
         print(f"🔄 Checking {sum(len(a) for a in alerts.values())} alerts...")
+        watched = set(COINGECKO_MAP) | {a['symbol'] for user_alerts in alerts.values() for a in user_alerts.values()}
+        prices = await get_coingecko_prices(watched)
         for user_id, user_alerts in list(alerts.items()):
             for alert_id, alert in list(user_alerts.items()):
-                price = await get_coingecko_price(alert['symbol'])
+                price = prices.get(alert['symbol'])
                 print(f"💰 {alert['symbol']} = ${price} vs {alert['limit']} {alert['direction']}")
                 
                 if price:
@@ -85,8 +107,7 @@ async def price_monitor():
                             parse_mode="Markdown"
                         )
                         del alerts[user_id][alert_id]
-                        cursor.execute('DELETE FROM alerts WHERE user_id=? AND alert_id=?', (user_id, alert_id))
-                        conn.commit()
+                        store.delete(user_id, alert_id)
         await asyncio.sleep(3)
 
 @dp.message(Command('start'))
@@ -102,10 +123,7 @@ async def start(message: types.Message):
 
 @dp.callback_query(lambda c: c.data == "test_price")
 async def test_price(callback: CallbackQuery):
-    prices = {}
-    for sym in ['BTCUSDT', 'ETHUSDT', 'SOLUSDT']:
-        price = await get_coingecko_price(sym)
-        prices[sym] = price
+    prices = await get_coingecko_prices(['BTCUSDT', 'ETHUSDT', 'SOLUSDT'])
     
     text = "🧪 **LIVE PRICES:**\n\n"
     for sym, price in prices.items():
@@ -153,7 +171,7 @@ async def set_dir(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     user_id = callback.from_user.id
     alert_id = f"{data['symbol']}_{direction}_{int(data['limit'])}"
-    alert = {'symbol': data['symbol'], 'limit': data['limit'], 'direction': direction}
+    alert = {'exchange': LEGACY_EXCHANGE, 'symbol': data['symbol'], 'limit': data['limit'], 'direction': direction}
     alerts[user_id][alert_id] = alert
     await save_alert(user_id, alert_id, alert)
     
@@ -186,9 +204,9 @@ async def list_alerts(callback: CallbackQuery):
 @dp.callback_query(lambda c: c.data == "del_all")
 async def del_all(callback: CallbackQuery):
     user_id = callback.from_user.id
+    for alert_id in alerts[user_id]:
+        store.delete(user_id, alert_id)
     alerts[user_id].clear()
-    cursor.execute('DELETE FROM alerts WHERE user_id=?', (user_id,))
-    conn.commit()
     await callback.answer("🗑️ All cleared!")
 
 @dp.callback_query(lambda c: c.data == "cancel")
@@ -198,10 +216,17 @@ async def cancel(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 async def main():
+    global sessions, store
+    sessions = SessionManager()
+    store = AlertStore(DB_PATH)
     await load_alerts()
     asyncio.create_task(price_monitor())
     print("🚀 COINGECKO BOT STARTED")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await sessions.close()
+        store.close()
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+
+from exchanges import REST_URLS, ExchangeError, canonical_symbol, wire_symbol
+
+CATALOG_PATH = os.getenv('CATALOG_PATH', 'symbols.json')
+CATALOG_REFRESH = float(os.getenv('CATALOG_REFRESH', '21600'))  # seconds between instrument list reloads
+CATALOG_RETRY = 300  # seconds before trying again when no exchange answered
+
+# Spot instrument lists: (url, path to the rows, symbol key, status key, status values that mean listed)
+INSTRUMENTS = {
+    'binance': (f"{REST_URLS['binance']}/api/v3/exchangeInfo?permissions=SPOT", ('symbols',),
+                'symbol', 'status', ('TRADING',)),
+    'bybit': (f"{REST_URLS['bybit']}/v5/market/instruments-info?category=spot", ('result', 'list'),
+              'symbol', 'status', ('Trading',)),
+    'htx': (f"{REST_URLS['htx']}/v1/common/symbols", ('data',),
+            'symbol', 'state', ('online',)),
+    'kucoin': (f"{REST_URLS['kucoin']}/api/v2/symbols", ('data',),
+               'symbol', 'enableTrading', (True,)),
+    'gateio': (f"{REST_URLS['gateio']}/api/v4/spot/currency_pairs", (),
+               'id', 'trade_status', ('tradable',)),
+    'bitmart': (f"{REST_URLS['bitmart']}/spot/v1/symbols/details", ('data', 'symbols'),
+                'symbol', 'trade_status', ('trading',)),
+}
+
+
+def parse_instruments(exchange, data):
+    """{canonical symbol: wire symbol} of everything tradable in an instrument list response"""
+    _, path, sym_key, status_key, listed = INSTRUMENTS[exchange]
+    rows = data
+    for key in path:
+        rows = rows.get(key) or {}
+    symbols = {}
+    for row in rows if isinstance(rows, list) else ():
+        wire = row.get(sym_key)
+        if wire and row.get(status_key) in listed:
+            symbols[canonical_symbol(wire)] = wire
+    return symbols
+
+
+async def get_instruments(session, exchange):
+    async with session.get(INSTRUMENTS[exchange][0]) as resp:
+        if resp.status != 200:
+            raise ExchangeError(f"HTTP {resp.status}")
+        symbols = parse_instruments(exchange, await resp.json(content_type=None))
+    if not symbols:
+        raise ExchangeError("empty instrument list")
+    return symbols
+
+
+class SymbolCatalog:
+    """Every listed spot symbol per exchange, for validating new alerts.
+
+    Lookups go through a {canonical: wire} dict per exchange (O(1)), prefix
+    suggestions through a sorted list of the canonical names. The lists are
+    cached in `path` so a restart has them at once; `run()` reloads them
+    from the exchanges every `refresh` seconds. An exchange whose list was
+    never loaded accepts any symbol, as before.
+    """
+
+    def __init__(self, path=CATALOG_PATH, refresh=CATALOG_REFRESH):
+        self.path = path
+        self.refresh = refresh
+        self.fetched_at = 0
+        self.symbols = {}  # exchange -> {canonical symbol: wire symbol}
+        self._sorted = {}  # exchange -> sorted canonical symbols
+
+    def _set(self, exchange, symbols):
+        self.symbols[exchange] = symbols
+        self._sorted[exchange] = sorted(symbols)
+
+    def load_cache(self):
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.fetched_at = cached.get('fetched_at', 0)
+        for exchange, symbols in cached.get('symbols', {}).items():
+            self._set(exchange, symbols)
+        logging.info(f"symbol catalog: {sum(map(len, self.symbols.values())):,} symbols from {self.path}")
+
+    def _save(self, data):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    async def update(self, sessions, fetcher):
+        """Reload every exchange's list; an exchange that fails keeps its previous one.
+        Returns False if none answered."""
+        exchanges = list(INSTRUMENTS)
+        results = await fetcher.gather([(ex, 'bulk', get_instruments, sessions.get(ex), ex) for ex in exchanges])
+        if not any(results):
+            return False
+        for exchange, symbols in zip(exchanges, results):
+            if symbols:
+                self._set(exchange, symbols)
+        self.fetched_at = time.time()
+        logging.info("symbol catalog: " + ', '.join(f"{ex} {len(s):,}" for ex, s in self.symbols.items()))
+        try:
+            await asyncio.to_thread(self._save, {'fetched_at': self.fetched_at, 'symbols': self.symbols})
+        except OSError as e:
+            logging.error(f"symbol catalog not saved: {e}")
+        return True
+
+    async def run(self, sessions, fetcher):
+        while True:
+            await asyncio.sleep(max(0, self.fetched_at + self.refresh - time.time()))
+            if not await self.update(sessions, fetcher):
+                await asyncio.sleep(CATALOG_RETRY)
+
+    def lookup(self, exchange, text):
+        """Canonical symbol for user input, None if the exchange doesn't list it"""
+        symbol = canonical_symbol(text.strip())
+        listed = self.symbols.get(exchange)
+        if listed is None:
+            return symbol or None
+        return symbol if symbol in listed else None
+
+    def suggest(self, exchange, text, n=5):
+        """Up to `n` listed symbols sharing the longest possible prefix with `text`"""
+        names = self._sorted.get(exchange, [])
+        symbol = canonical_symbol(text.strip())
+        for k in range(len(symbol), 1, -1):
+            prefix = symbol[:k]
+            i = bisect_left(names, prefix)
+            matches = []
+            while i < len(names) and len(matches) < n and names[i].startswith(prefix):
+                matches.append(names[i])
+                i += 1
+            if matches:
+                return matches
+        return []
+
+    def wire(self, exchange, symbol):
+        """The exchange's own spelling of a canonical symbol"""
+        listed = self.symbols.get(exchange)
+        wire = listed.get(symbol) if listed else None
+        return wire or wire_symbol(exchange, symbol)
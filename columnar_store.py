@@ -0,0 +1,245 @@
+import numpy as np
+
+
+def _grown(column, capacity):
+    new = np.empty(capacity, dtype=object) if column.dtype == object else np.zeros(capacity, dtype=column.dtype)
+    new[:len(column)] = column
+    return new
+
+
+class _Side:
+    """One direction on one pair: its limits sorted, with the slot of each in a parallel int array"""
+
+    __slots__ = ('limit', 'slot', 'n')
+
+    def __init__(self, capacity=8):
+        self.limit = np.zeros(capacity, dtype=np.float64)
+        self.slot = np.zeros(capacity, dtype=np.int32)
+        self.n = 0
+
+    def _grow(self, need):
+        capacity = len(self.limit)
+        if need > capacity:
+            while capacity < need:
+                capacity *= 2
+            self.limit = _grown(self.limit, capacity)
+            self.slot = _grown(self.slot, capacity)
+
+    def add(self, limit, slot):
+        n = self.n
+        i = int(np.searchsorted(self.limit[:n], limit, 'right'))
+        self._grow(n + 1)
+        for column, value in ((self.limit, limit), (self.slot, slot)):
+            column[i + 1:n + 1] = column[i:n]
+            column[i] = value
+        self.n = n + 1
+
+    def extend(self, limits, slots):
+        """Merge limits and their slots in with one stable sort"""
+        n, k = self.n, len(limits)
+        self._grow(n + k)
+        self.limit[n:n + k] = limits
+        self.slot[n:n + k] = slots
+        n += k
+        order = np.argsort(self.limit[:n], kind='stable')
+        self.limit[:n] = self.limit[:n][order]
+        self.slot[:n] = self.slot[:n][order]
+        self.n = n
+
+    def remove(self, limit, slot):
+        n = self.n
+        i = int(np.searchsorted(self.limit[:n], limit, 'left'))
+        j = int(np.searchsorted(self.limit[:n], limit, 'right'))
+        hit = np.flatnonzero(self.slot[i:j] == slot)
+        if not len(hit):
+            return False
+        k = i + int(hit[0])
+        for column in (self.limit, self.slot):
+            column[k:n - 1] = column[k + 1:n]
+        self.n = n - 1
+        return True
+
+    def nbytes(self):
+        return self.limit.nbytes + self.slot.nbytes
+
+
+class ColumnarAlertStore:
+    """Alerts as parallel NumPy columns instead of one dict per alert.
+
+    Every alert owns a slot in the columns limit / user_id / pair code /
+    direction flag / muted flag / alert_id; deleted slots go on a free list
+    and are reused first. Each (pair, direction) keeps its limits sorted with
+    their slot numbers alongside, so a per-pair query is a `searchsorted`
+    -- O(log n + k), never a scan over every stored alert. The only Python
+    objects per alert are one entry in the user_id -> {alert_id: slot} map.
+    Drop-in for ThresholdIndex (`add` / `add_many` / `discard` / `crossed` /
+    `band` / `nearest` / `pairs`), plus `set_muted` and `evaluate(prices)`
+    for a whole tick. Muted alerts keep their slot and are skipped by
+    `crossed`; `band` and `nearest` still count them, which only narrows.
+    """
+
+    def __init__(self, capacity=1024):
+        self.limit = np.zeros(capacity, dtype=np.float64)
+        self.user_id = np.zeros(capacity, dtype=np.int64)
+        self.pair = np.zeros(capacity, dtype=np.int32)  # code into self._pairs
+        self.above = np.zeros(capacity, dtype=np.bool_)  # direction flag
+        self.muted = np.zeros(capacity, dtype=np.bool_)
+        self.alert_id = np.empty(capacity, dtype=object)
+        self.used = 0  # slots handed out so far; below this, free ones are in _free
+        self._free = []
+        self._slots = {}  # user_id -> {alert_id: slot}
+        self._codes = {}  # pair -> code
+        self._pairs = []  # code -> pair
+        self._books = {}  # pair -> {'above': _Side, 'below': _Side}
+        self._count = 0
+        self._muted = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key):
+        user_id, alert_id = key
+        return alert_id in self._slots.get(user_id, ())
+
+    def pairs(self):
+        return self._books.keys()
+
+    def _slot(self, user_id, alert_id, pair, direction, limit):
+        """Take a slot (a freed one first) and fill in its columns"""
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = self.used
+            if slot == len(self.limit):
+                for name in ('limit', 'user_id', 'pair', 'above', 'muted', 'alert_id'):
+                    setattr(self, name, _grown(getattr(self, name), 2 * slot))
+            self.used = slot + 1
+        code = self._codes.get(pair)
+        if code is None:
+            code = self._codes[pair] = len(self._pairs)
+            self._pairs.append(pair)
+        self.limit[slot] = limit
+        self.user_id[slot] = user_id
+        self.pair[slot] = code
+        self.above[slot] = direction == 'above'
+        self.alert_id[slot] = alert_id
+        self._slots.setdefault(user_id, {})[alert_id] = slot
+        self._count += 1
+        return slot
+
+    def _book(self, pair):
+        book = self._books.get(pair)
+        if book is None:
+            book = self._books[pair] = {'above': _Side(), 'below': _Side()}
+        return book
+
+    def add(self, pair, user_id, alert_id, direction, limit):
+        self.discard(user_id, alert_id)
+        slot = self._slot(user_id, alert_id, pair, direction, limit)
+        self._book(pair)[direction].add(limit, slot)
+
+    def add_many(self, rows):
+        """Bulk insert [(pair, user_id, alert_id, direction, limit)]: one sort per side"""
+        grouped = {}
+        for pair, user_id, alert_id, direction, limit in rows:
+            self.discard(user_id, alert_id)
+            slot = self._slot(user_id, alert_id, pair, direction, limit)
+            entries = grouped.get((pair, direction))
+            if entries is None:
+                entries = grouped[(pair, direction)] = ([], [])
+            entries[0].append(limit)
+            entries[1].append(slot)
+        for (pair, direction), (limits, slots) in grouped.items():
+            self._book(pair)[direction].extend(limits, slots)
+
+    def discard(self, user_id, alert_id):
+        user = self._slots.get(user_id)
+        slot = user.pop(alert_id, None) if user else None
+        if slot is None:
+            return False
+        if not user:
+            del self._slots[user_id]
+        pair = self._pairs[self.pair[slot]]
+        book = self._books[pair]
+        book['above' if self.above[slot] else 'below'].remove(self.limit[slot], slot)
+        if not book['above'].n and not book['below'].n:
+            del self._books[pair]
+        if self.muted[slot]:
+            self.muted[slot] = False
+            self._muted -= 1
+        self.alert_id[slot] = None
+        self._free.append(slot)
+        self._count -= 1
+        return True
+
+    def set_muted(self, user_id, alert_id, muted):
+        """Mute or unmute in place; False if the alert is not stored"""
+        slot = self._slots.get(user_id, {}).get(alert_id)
+        if slot is None:
+            return False
+        if self.muted[slot] != muted:
+            self.muted[slot] = muted
+            self._muted += 1 if muted else -1
+        return True
+
+    def crossed(self, pair, price):
+        """[(user_id, alert_id)] of every unmuted alert on `pair` whose condition holds at `price`"""
+        book = self._books.get(pair)
+        if book is None:
+            return []
+        above, below = book['above'], book['below']
+        i = int(np.searchsorted(above.limit[:above.n], price, 'right'))
+        j = int(np.searchsorted(below.limit[:below.n], price, 'left'))
+        if not i:
+            if j == below.n:
+                return []
+            slots = below.slot[j:below.n]
+        elif j == below.n:
+            slots = above.slot[:i]
+        else:
+            slots = np.concatenate((above.slot[:i], below.slot[j:below.n]))
+        if self._muted:
+            slots = slots[~self.muted[slots]]
+        return list(zip(self.user_id[slots].tolist(), self.alert_id[slots].tolist()))
+
+    def band(self, pair, price):
+        """(low, high) such that no price strictly between crosses anything on `pair`,
+        or None if something is crossed at `price` itself"""
+        book = self._books.get(pair)
+        if book is None:
+            return -np.inf, np.inf
+        above, below = book['above'], book['below']
+        high = float(above.limit[0]) if above.n else np.inf
+        low = float(below.limit[below.n - 1]) if below.n else -np.inf
+        if high <= price or low >= price:
+            return None
+        return low, high
+
+    def nearest(self, pair, price):
+        """Distance from `price` to the closest limit on `pair` not yet crossed (None if none)"""
+        book = self._books.get(pair)
+        if book is None:
+            return None
+        above, below = book['above'], book['below']
+        gaps = []
+        i = int(np.searchsorted(above.limit[:above.n], price, 'right'))
+        if i < above.n:
+            gaps.append(float(above.limit[i]) - price)
+        j = int(np.searchsorted(below.limit[:below.n], price, 'left'))
+        if j > 0:
+            gaps.append(price - float(below.limit[j - 1]))
+        return min(gaps) if gaps else None
+
+    def evaluate(self, prices):
+        """All alerts triggered by a {pair: price} snapshot"""
+        hits = []
+        for pair, price in prices.items():
+            if price:
+                hits.extend(self.crossed(pair, price))
+        return hits
+
+    def nbytes(self):
+        """Bytes held by the columns (alert_id counts pointers, not the strings)"""
+        columns = (self.limit, self.user_id, self.pair, self.above, self.muted, self.alert_id)
+        return sum(column.nbytes for column in columns) + \
+            sum(side.nbytes() for book in self._books.values() for side in book.values())
@@ -0,0 +1,138 @@
+import os
+import time
+from collections import defaultdict
+
+from alert_index import ThresholdIndex
+from exchanges import canonical_symbol
+from spreads import SpreadBook, is_spread, legs
+from triggers import ARMED, watch_level, on_cross
+
+# ALERT_ENGINE: 'index' (sorted thresholds) or 'columnar' (NumPy columns, needs numpy)
+ALERT_ENGINE = os.getenv('ALERT_ENGINE', 'index')
+
+
+def pair_of(alert):
+    return alert['exchange'], canonical_symbol(alert['symbol'])
+
+
+def pairs_of(alert):
+    """Every (exchange, symbol) whose price the alert depends on"""
+    return legs(alert) if is_spread(alert) else (pair_of(alert),)
+
+
+class AlertEngine:
+    """The alert evaluation core: prices in, state changes and triggers out.
+
+    No I/O and no clock of its own -- callers feed it prices with
+    `on_price` (or `check_alerts` per price and `check_spreads` once per
+    tick) and may pass the time the price was seen, so the same code runs
+    live in Monitor and offline in replay.py. After a pair is checked the
+    index's quiet band around its price is kept: prices inside it cannot
+    cross anything and skip the index altogether. `on_trigger(user_id, alert_id,
+    alert, price)` is called when an alert fires, `on_state(user_id,
+    alert_id, alert)` whenever an alert's state changes and should be saved.
+    """
+
+    def __init__(self, on_trigger, on_state, alerts=None, engine=ALERT_ENGINE):
+        self.on_trigger = on_trigger
+        self.on_state = on_state
+        self.alerts = alerts if alerts is not None else defaultdict(dict)
+        if engine == 'columnar':
+            from columnar_store import ColumnarAlertStore
+            self.index = ColumnarAlertStore()
+        else:
+            self.index = ThresholdIndex()  # active alerts by (exchange, canonical symbol), sorted by limit
+        self.spreads = SpreadBook()  # cross-exchange spread alerts, over one symbols x exchanges price matrix
+        self._quiet = {}  # pair -> (low, high) open price band that crosses nothing, None to check every price
+
+    def __len__(self):
+        return len(self.index) + len(self.spreads)
+
+    def add_many(self, rows):
+        """Bulk-file [(user_id, alert_id, alert)]; returns the pairs they watch"""
+        fresh = []
+        watched = set()
+        for user_id, alert_id, alert in rows:
+            self.alerts[user_id][alert_id] = alert
+            if alert.get('muted', False):
+                continue
+            if is_spread(alert):
+                self.spreads.add(user_id, alert_id, alert)
+                watched.update(legs(alert))
+            else:
+                fresh.append((pair_of(alert), user_id, alert_id, *watch_level(alert)))
+        self.index.add_many(fresh)
+        for pair, *_ in fresh:
+            self._quiet.pop(pair, None)
+            watched.add(pair)
+        return watched
+
+    def update(self, user_id, alert_id, alert):
+        """An alert was created, changed, or deleted (alert None)"""
+        if alert is None:
+            self.alerts[user_id].pop(alert_id, None)
+        else:
+            self.alerts[user_id][alert_id] = alert
+        self.file_alert(user_id, alert_id)
+
+    def file_alert(self, user_id, alert_id):
+        """Re-file one alert in the threshold index or spread book (drops it if deleted or muted)"""
+        alert = self.alerts[user_id].get(alert_id)
+        if not alert or alert.get('muted', False):
+            self.index.discard(user_id, alert_id)
+            self.spreads.discard(user_id, alert_id)
+        elif is_spread(alert):
+            self.spreads.add(user_id, alert_id, alert)  # re-filing keeps the prices already seen
+        else:
+            # Removing a level only widens a pair's quiet band; adding one may cut it
+            pair = pair_of(alert)
+            self.index.add(pair, user_id, alert_id, *watch_level(alert))
+            self._quiet.pop(pair, None)
+
+    def pairs(self):
+        """Every (exchange, symbol) to price: alert pairs plus both legs of each spread"""
+        if not self.spreads:
+            return self.index.pairs()
+        return self.index.pairs() | self.spreads.pairs()
+
+    def nearest(self, pair, price):
+        """Distance from `price` to the closest level on `pair` that would change an alert (None if none)"""
+        gaps = [gap for gap in (self.index.nearest(pair, price), self.spreads.nearest(pair, price))
+                if gap is not None]
+        return min(gaps) if gaps else None
+
+    def check_alerts(self, exchange, symbol, price, now=None):
+        """Advance every alert on this pair whose watched level `price` crossed"""
+        pair = (exchange, symbol)
+        band = self._quiet.get(pair)
+        if band is None or not band[0] < price < band[1]:
+            now = time.time() if now is None else now
+            for user_id, alert_id in self.index.crossed(pair, price):
+                self._cross(user_id, alert_id, price, now)
+            # Alerts still crossed (e.g. cooling down) leave no band: every price is checked
+            self._quiet[pair] = self.index.band(pair, price)
+        self.spreads.observe(exchange, symbol, price)
+
+    def check_spreads(self, now=None):
+        """Advance the spread alerts on every symbol whose prices changed since the last call"""
+        now = time.time() if now is None else now
+        for user_id, alert_id, spread in self.spreads.crossed():
+            self._cross(user_id, alert_id, spread, now)
+
+    def on_price(self, exchange, symbol, price, now=None):
+        """A single price, e.g. streamed: its matrix row changed, so its spreads are checked right away"""
+        self.check_alerts(exchange, symbol, price, now)
+        if self.spreads.changed:
+            self.check_spreads(now)
+
+    def _cross(self, user_id, alert_id, price, now):
+        alert = self.alerts[user_id].get(alert_id)
+        if alert is None:
+            return
+        state = alert.get('state', ARMED)
+        # Edge-triggered: notify once on crossing, then wait for the re-arm level
+        if on_cross(alert, now):
+            self.on_trigger(user_id, alert_id, alert, price)
+        if alert.get('state', ARMED) != state:
+            self.file_alert(user_id, alert_id)
+            self.on_state(user_id, alert_id, alert)
@@ -0,0 +1,163 @@
+import os
+
+# REST API roots; REST_URL_<EXCHANGE> points one at a local stand-in (see bench/api_standin.py)
+REST_URLS = {
+    'binance': "https://api.binance.com",
+    'bybit': "https://api.bybit.com",
+    'htx': "https://api.huobi.pro",
+    'kucoin': "https://api.kucoin.com",
+    'gateio': "https://api.gateio.ws",
+    'bitmart': "https://api-cloud.bitmart.com",
+}
+REST_URLS = {ex: os.getenv(f"REST_URL_{ex.upper()}", url).rstrip('/') for ex, url in REST_URLS.items()}
+
+# BULK TICKER ENDPOINTS: one request returns every spot symbol's last price
+BULK_URLS = {
+    'binance': f"{REST_URLS['binance']}/api/v3/ticker/price",
+    'bybit': f"{REST_URLS['bybit']}/v5/market/tickers?category=spot",
+    'htx': f"{REST_URLS['htx']}/market/tickers",
+    'kucoin': f"{REST_URLS['kucoin']}/api/v1/market/allTickers",
+    'gateio': f"{REST_URLS['gateio']}/api/v4/spot/tickers",
+    'bitmart': f"{REST_URLS['bitmart']}/spot/v1/ticker",
+}
+
+
+class ExchangeError(Exception):
+    """The exchange itself failed (rate limited, 5xx, bad response) -- not just an unknown symbol"""
+
+
+def check_status(resp):
+    if resp.status == 429 or resp.status >= 500:
+        raise ExchangeError(f"HTTP {resp.status}")
+
+
+def canonical_symbol(symbol):
+    """BTC/USDT, btc-usdt, BTC_USDT -> BTCUSDT"""
+    return symbol.upper().replace('/', '').replace('-', '').replace('_', '')
+
+
+# Quote assets; longer stablecoin quotes are tried before USD so BTCUSDT splits as BTC/USDT
+QUOTES = ('FDUSD', 'USDT', 'USDC', 'BUSD', 'TUSD', 'USDD', 'DAI', 'USD', 'EUR', 'TRY', 'BTC', 'ETH', 'BNB')
+
+
+def split_symbol(symbol):
+    """BTCUSDT -> ('BTC', 'USDT'); explicit separators win over quote guessing"""
+    for sep in ('/', '-', '_'):
+        if sep in symbol:
+            base, quote = symbol.upper().split(sep, 1)
+            return base, quote
+    symbol = symbol.upper()
+    for quote in QUOTES:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    return symbol, ''
+
+
+def wire_symbol(exchange, symbol):
+    """Exchange-specific spelling of a symbol (BTC-USDT on KuCoin, btcusdt on HTX...)"""
+    base, quote = split_symbol(symbol)
+    if exchange == 'htx':
+        return (base + quote).lower()
+    if exchange == 'kucoin':
+        return f"{base}-{quote}"
+    if exchange in ('gateio', 'bitmart'):
+        return f"{base}_{quote}"
+    return base + quote
+
+
+def _index(rows, sym_key, price_key):
+    prices = {}
+    for row in rows:
+        try:
+            price = float(row[price_key])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if price > 0:
+            prices[canonical_symbol(row[sym_key])] = price
+    return prices
+
+
+def parse_bulk(exchange, data):
+    """Turn a bulk ticker response into a {canonical symbol: price} dict"""
+    if exchange == 'binance':
+        return _index(data, 'symbol', 'price')
+    if exchange == 'bybit':
+        if data.get('retCode') == 0:
+            return _index(data['result']['list'], 'symbol', 'lastPrice')
+    elif exchange == 'htx':
+        if data.get('status') == 'ok':
+            return _index(data['data'], 'symbol', 'close')
+    elif exchange == 'kucoin':
+        if data.get('code') == '200000':
+            return _index(data['data']['ticker'], 'symbol', 'last')
+    elif exchange == 'gateio':
+        return _index(data, 'currency_pair', 'last')
+    elif exchange == 'bitmart':
+        if data.get('code') == 1000 or data.get('code') == '1000':
+            return _index(data['data']['tickers'], 'symbol', 'last_price')
+    return {}
+
+
+async def get_snapshot(session, exchange):
+    """One HTTP call -> every symbol's price on `exchange`"""
+    async with session.get(BULK_URLS[exchange]) as resp:
+        if resp.status != 200:
+            raise ExchangeError(f"HTTP {resp.status}")
+        prices = parse_bulk(exchange, await resp.json(content_type=None))
+    if not prices:
+        raise ExchangeError("empty ticker snapshot")
+    return prices
+
+
+async def get_price(session, exchange, wire):
+    """Last price of one symbol, given in the exchange's own spelling (see wire_symbol),
+    None if the exchange doesn't list it.
+    Raises when the exchange itself fails so its health tracking sees it."""
+    if exchange == 'binance':
+        url = f"{REST_URLS['binance']}/api/v3/ticker/price?symbol={wire}"
+        async with session.get(url) as resp:
+            check_status(resp)
+            if resp.status == 200:
+                data = await resp.json()
+                return float(data['price'])
+    elif exchange == 'bybit':
+        url = f"{REST_URLS['bybit']}/v5/market/tickers?category=spot&symbol={wire}"
+        async with session.get(url) as resp:
+            check_status(resp)
+            if resp.status == 200:
+                data = await resp.json()
+                if data.get('retCode') == 0 and data['result']['list']:
+                    return float(data['result']['list'][0]['lastPrice'])
+    elif exchange == 'htx':
+        url = f"{REST_URLS['htx']}/market/detail/merged?symbol={wire}"
+        async with session.get(url) as resp:
+            check_status(resp)
+            if resp.status == 200:
+                data = await resp.json()
+                if 'tick' in data:
+                    return float(data['tick']['close'])
+    elif exchange == 'kucoin':
+        url = f"{REST_URLS['kucoin']}/api/v1/market/orderbook/level1?symbol={wire}"
+        async with session.get(url) as resp:
+            check_status(resp)
+            if resp.status == 200:
+                data = await resp.json()
+                if data.get('code') == '200000' and data.get('data'):
+                    return float(data['data']['price'])
+    elif exchange == 'gateio':
+        url = f"{REST_URLS['gateio']}/api/v4/spot/tickers?currency_pair={wire}"
+        async with session.get(url) as resp:
+            check_status(resp)
+            if resp.status == 200:
+                data = await resp.json()
+                for ticker in data:
+                    if ticker['currency_pair'] == wire:
+                        return float(ticker['last'])
+    elif exchange == 'bitmart':
+        url = f"{REST_URLS['bitmart']}/spot/v1/ticker?symbol={wire}"
+        async with session.get(url) as resp:
+            check_status(resp)
+            if resp.status == 200:
+                data = await resp.json()
+                if data.get('code') in (1000, '1000') and data['data']['tickers']:
+                    return float(data['data']['tickers'][0]['last_price'])
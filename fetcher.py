@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+import time
+
+from health import HALF_OPEN, ExchangeHealth
+from metrics import FETCH_ERRORS, FETCH_LATENCY
+from ratelimit import TokenBucket
+
+# HEDGING: re-send a request still pending after the exchange's p95 latency, take whichever answers first
+HEDGING = os.getenv('HEDGING', '0') == '1'
+
+# Per-exchange budgets, kept under each exchange's published public limits.
+# rate/burst are in the exchange's own weight units per second; a full burst plus
+# `rate` for the rest of the exchange's window must still fit: burst + window * rate <= limit.
+EXCHANGE_LIMITS = {
+    # 6000 weight/min per IP; ticker/price costs 2 per symbol, 4 for all symbols
+    'binance': {'concurrency': 10, 'rate': 80, 'burst': 160, 'single': 2, 'bulk': 4},
+    # 600 requests/5s per IP
+    'bybit': {'concurrency': 10, 'rate': 60, 'burst': 120, 'single': 1, 'bulk': 1},
+    # 100 requests/10s per IP for market data
+    'htx': {'concurrency': 5, 'rate': 8, 'burst': 16, 'single': 1, 'bulk': 1},
+    # 2000 weight/30s per IP; level1 costs 2, allTickers 15
+    'kucoin': {'concurrency': 5, 'rate': 50, 'burst': 100, 'single': 2, 'bulk': 15},
+    # 200 requests/10s per endpoint
+    'gateio': {'concurrency': 5, 'rate': 15, 'burst': 30, 'single': 1, 'bulk': 1},
+    # 10 requests/2s for the ticker endpoint
+    'bitmart': {'concurrency': 3, 'rate': 3, 'burst': 4, 'single': 1, 'bulk': 1},
+}
+DEFAULT_LIMITS = {'concurrency': 4, 'rate': 5, 'burst': 10, 'single': 1, 'bulk': 1}
+
+
+def share_limits(limits, parts):
+    """Each of `parts` processes calling from one IP gets 1/parts of every exchange's budget"""
+    shared = {}
+    for exchange, cfg in limits.items():
+        # A bucket smaller than one call would never let it through
+        floor = max(cfg['single'], cfg['bulk'])
+        shared[exchange] = {**cfg, 'concurrency': max(1, cfg['concurrency'] // parts),
+                            'rate': cfg['rate'] / parts, 'burst': max(cfg['burst'] / parts, floor)}
+    return shared
+
+
+class FetchScheduler:
+    """Runs exchange requests concurrently across exchanges while each exchange
+    stays inside its own concurrency cap and token-bucket rate limit.
+
+    Every call is tracked in the exchange's ExchangeHealth; an exception
+    counts as a failure and returns None. While the circuit breaker is open
+    calls return None at once instead of waiting on timeouts.
+    """
+
+    def __init__(self, limits=EXCHANGE_LIMITS, hedging=HEDGING):
+        self.limits = limits
+        self.hedging = hedging
+        self.health = {}
+        self._semaphores = {}
+        self._buckets = {}
+
+    def _limits(self, exchange):
+        return self.limits.get(exchange, DEFAULT_LIMITS)
+
+    def _gate(self, exchange):
+        if exchange not in self._semaphores:
+            cfg = self._limits(exchange)
+            self._semaphores[exchange] = asyncio.Semaphore(cfg['concurrency'])
+            self._buckets[exchange] = TokenBucket(cfg['rate'], cfg['burst'])
+        return self._semaphores[exchange], self._buckets[exchange]
+
+    def _health(self, exchange):
+        if exchange not in self.health:
+            self.health[exchange] = ExchangeHealth()
+        return self.health[exchange]
+
+    async def _call(self, exchange, kind, fn, args):
+        """(result, seconds the exchange took), not counting the wait for a slot and budget"""
+        semaphore, bucket = self._gate(exchange)
+        async with semaphore:
+            await bucket.acquire(self._limits(exchange)[kind])
+            started = time.monotonic()
+            result = await fn(*args)
+            return result, time.monotonic() - started
+
+    async def run(self, exchange, kind, fn, *args):
+        """Await fn(*args) once `exchange` has a free slot and `kind` ('single'/'bulk') worth of budget"""
+        health = self._health(exchange)
+        if not health.allow():
+            return None
+        probe = health.state == HALF_OPEN
+        tasks = [asyncio.ensure_future(self._call(exchange, kind, fn, args))]
+        result, elapsed, ok = None, 0.0, False
+        try:
+            delay = health.hedge_delay() if self.hedging else None
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    tasks.append(asyncio.ensure_future(self._call(exchange, kind, fn, args)))
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    (result, elapsed), ok = await next_done, True
+                    break
+                except Exception as e:
+                    logging.warning(f"{exchange} request failed: {e!r}")
+        except asyncio.CancelledError:
+            # A probe that never reports would leave the breaker half-open, refusing every call
+            if probe:
+                health.record(False, 0.0)
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+        health.record(ok, elapsed)
+        if ok:
+            FETCH_LATENCY.observe(elapsed, exchange)
+        else:
+            FETCH_ERRORS.inc(exchange)
+        return result
+
+    async def gather(self, calls):
+        """[(exchange, kind, fn, *args), ...] -> results in the same order"""
+        return await asyncio.gather(*(self.run(*call) for call in calls))
@@ -0,0 +1,74 @@
+import os
+import time
+from collections import deque
+
+BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', '5'))  # consecutive failures that open the breaker
+BREAKER_ERROR_RATE = float(os.getenv('BREAKER_ERROR_RATE', '0.5'))  # or this error-rate EWMA
+BREAKER_BACKOFF_MIN = float(os.getenv('BREAKER_BACKOFF_MIN', '5'))  # seconds open after the first trip
+BREAKER_BACKOFF_MAX = float(os.getenv('BREAKER_BACKOFF_MAX', '300'))
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '95'))
+EWMA_ALPHA = 0.2
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class ExchangeHealth:
+    """Error-rate / latency EWMAs and a circuit breaker for one exchange.
+
+    After BREAKER_FAILURES consecutive failures (or an error-rate EWMA over
+    BREAKER_ERROR_RATE) the breaker opens and calls are refused. When the
+    backoff is up one probe is let through (half-open): success closes the
+    breaker, failure re-opens it for twice as long.
+    """
+
+    def __init__(self):
+        self.state = CLOSED
+        self.latency = None  # EWMA seconds
+        self.error_rate = 0.0  # EWMA of failures
+        self.failures = 0  # consecutive
+        self.samples = 0
+        self.backoff = BREAKER_BACKOFF_MIN
+        self.open_until = 0.0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def allow(self, now=None):
+        now = time.monotonic() if now is None else now
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now >= self.open_until:
+            self.state = HALF_OPEN  # exactly one probe goes through
+            return True
+        return False
+
+    def record(self, ok, latency, now=None):
+        now = time.monotonic() if now is None else now
+        self.samples += 1
+        self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self._latencies.append(latency)
+            self.latency = latency if self.latency is None else self.latency + EWMA_ALPHA * (latency - self.latency)
+            self.failures = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.backoff = BREAKER_BACKOFF_MIN
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            self._trip(now, min(self.backoff * 2, BREAKER_BACKOFF_MAX))
+        elif self.state == CLOSED and (self.failures >= BREAKER_FAILURES or
+                                       (self.samples >= MIN_SAMPLES and self.error_rate > BREAKER_ERROR_RATE)):
+            self._trip(now, self.backoff)
+
+    def _trip(self, now, backoff):
+        self.state = OPEN
+        self.backoff = backoff
+        self.open_until = now + backoff
+
+    def hedge_delay(self):
+        """Latency percentile after which a second request is worth sending (None until known)"""
+        if len(self._latencies) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(int(len(ordered) * HEDGE_PERCENTILE / 100), len(ordered) - 1)]
@@ -0,0 +1,215 @@
+import heapq
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import Counter as StackCounter
+
+from aiohttp import web
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))  # 0 disables the endpoint
+PROFILE_TICKS = os.getenv('PROFILE_TICKS', '0') == '1'
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.005'))  # seconds between stack samples
+PROFILE_KEEP = 5  # slowest ticks kept
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        REGISTRY.append(self)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, n=1):
+        self._values[labels] = self._values.get(labels, 0) + n
+
+    def render(self):
+        return self.header() + [f"{self.name}{_labels(self.labels, k)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Set directly, or give `fn` returning {label tuple: value} to read at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name, help, labels=(), fn=None):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def set(self, value, *labels):
+        self._values[labels] = value
+
+    def render(self):
+        values = self.fn() if self.fn else self._values
+        return self.header() + [f"{self.name}{_labels(self.labels, k)} {v}" for k, v in values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        counts = self._values.get(labels)
+        if counts is None:
+            counts = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        counts[0][bisect_left(self.buckets, value)] += 1
+        counts[1] += value
+        counts[2] += 1
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = self.header()
+        for key, (counts, total, n) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {n}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+        self.histogram.observe(self.elapsed, *self.labels)
+
+
+REGISTRY = []
+
+FETCH_LATENCY = Histogram('price_fetch_seconds', 'Exchange request latency', ['exchange'])
+FETCH_ERRORS = Counter('price_fetch_errors_total', 'Failed exchange requests', ['exchange'])
+TICK_DURATION = Histogram('monitor_tick_seconds', 'price_monitor tick duration')
+EVAL_DURATION = Histogram('alert_eval_seconds', 'Alert evaluation time per tick', buckets=FAST_BUCKETS)
+SEND_LATENCY = Histogram('telegram_send_seconds', 'Telegram send_message latency')
+TRIGGERS = Counter('alert_triggers_total', 'Alerts that fired')
+SEND_FAILURES = Counter('telegram_send_failures_total', 'Telegram sends that failed')
+RATE_LIMITED = Counter('telegram_429_total', 'Telegram 429 responses')
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class TickProfiler:
+    """Opt-in sampling profiler for monitor ticks.
+
+    While a tick runs, a background thread samples the event loop thread's
+    stack every PROFILE_INTERVAL seconds. The PROFILE_KEEP slowest ticks keep
+    their sample counts; `report()` prints their hottest stacks.
+    """
+
+    def __init__(self, enabled=PROFILE_TICKS, interval=PROFILE_INTERVAL, keep=PROFILE_KEEP):
+        self.enabled = enabled
+        self.interval = interval
+        self.keep = keep
+        self.slowest = []  # min-heap of (duration, started, StackCounter)
+        self._samples = None
+        self._target = None
+        self._thread = None
+
+    def _sampler(self):
+        while True:
+            time.sleep(self.interval)
+            samples = self._samples
+            if samples is None:
+                continue
+            frame = sys._current_frames().get(self._target)
+            if frame is not None:
+                stack = traceback.extract_stack(frame)[-8:]
+                samples[' <- '.join(f"{f.name}:{f.lineno}" for f in reversed(stack))] += 1
+
+    def start(self):
+        if not self.enabled:
+            return
+        self._target = threading.get_ident()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._sampler, name='tick-profiler', daemon=True)
+            self._thread.start()
+        self._samples = StackCounter()
+        self._started = time.time()
+        self._t0 = time.perf_counter()
+
+    def stop(self):
+        if not self.enabled or self._samples is None:
+            return
+        samples, self._samples = self._samples, None
+        entry = (time.perf_counter() - self._t0, self._started, samples)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        elif entry[0] > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def report(self, top=10):
+        lines = []
+        for duration, started, samples in sorted(self.slowest, reverse=True):
+            when = time.strftime('%H:%M:%S', time.localtime(started))
+            lines.append(f"tick at {when}: {duration * 1000:.1f} ms, {sum(samples.values())} samples")
+            for stack, n in samples.most_common(top):
+                lines.append(f"  {n:5d}  {stack}")
+        return '\n'.join(lines) + '\n' if lines else "no ticks profiled (set PROFILE_TICKS=1)\n"
+
+
+PROFILER = TickProfiler()
+
+
+async def start_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve /metrics (Prometheus text) and /debug/slow_ticks; returns the runner"""
+    if not port:
+        return None
+
+    async def metrics_handler(request):
+        return web.Response(body=render().encode(),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+    async def slow_ticks_handler(request):
+        return web.Response(text=PROFILER.report())
+
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    app.router.add_get('/debug/slow_ticks', slow_ticks_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"metrics on http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+import time
+
+from engine import AlertEngine, pairs_of
+from exchanges import get_price, get_snapshot, wire_symbol
+from metrics import Gauge, PROFILER, TICK_DURATION, EVAL_DURATION
+from scheduler import PollScheduler, POLL_MAX
+from streams import PriceStreams
+
+# SNAPSHOT MODE: one bulk ticker call per exchange per tick instead of one call per symbol
+SNAPSHOT_MODE = os.getenv('SNAPSHOT_MODE', '1') == '1'
+# STREAMING: WebSocket tickers for watched pairs, REST polling only as fallback
+STREAMING = os.getenv('STREAMING', '1') == '1'
+POLL_INTERVAL = 5  # seconds between checks on streamed pairs and retries after a failed fetch
+
+ACTIVE_ALERTS = Gauge('active_alerts', 'Alerts being monitored (not muted)')
+WATCHED_PAIRS = Gauge('watched_pairs', 'Distinct (exchange, symbol) pairs with active alerts')
+BREAKER_OPEN = Gauge('exchange_breaker_open', '1 while the exchange circuit breaker refuses calls', ['exchange'])
+
+
+class Monitor:
+    """Prices every watched (exchange, symbol) and feeds the prices to an AlertEngine.
+
+    bot.py runs one over all alerts; with MONITOR_SHARDS each worker process
+    in shards.py runs one over its partition of symbols. `on_trigger` and
+    `on_state` are the engine's callbacks. `wire(exchange, symbol)` gives
+    the exchange's spelling for single-symbol calls (e.g. SymbolCatalog.wire);
+    it is looked up once per pair. Spread legs are watched like any other
+    pair, so spread alerts cost no requests of their own.
+    """
+
+    def __init__(self, sessions, fetcher, on_trigger, on_state, alerts=None, wire=wire_symbol):
+        self.sessions = sessions
+        self.wire = wire
+        self._wires = {}  # pair -> wire symbol
+        self.fetcher = fetcher  # concurrent across exchanges, rate-limited per exchange
+        self.engine = AlertEngine(on_trigger, on_state, alerts)
+        self.alerts = self.engine.alerts
+        self.scheduler = PollScheduler(self.engine.nearest)  # polls pairs near a limit often, far ones rarely
+        self.streams = PriceStreams(sessions, self.engine.on_price, self._wire) if STREAMING else None
+        self.poll_wake = asyncio.Event()  # interrupts the monitor's sleep when new pairs need a poll
+        self.first_chunk = asyncio.Event()  # set once the first chunk of stored alerts is indexed
+        self.started = time.monotonic()
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.streams:
+            await self.streams.close()
+
+    async def add_many(self, rows):
+        """Bulk-file [(user_id, alert_id, alert)], e.g. one chunk of stored alerts"""
+        self.poll_soon(self.engine.add_many(rows))
+        if self.streams:
+            await self.streams.sync(self.engine.pairs())
+        self.first_chunk.set()
+
+    def loaded(self):
+        """Every stored alert has been handed over (start monitoring even if there were none)"""
+        self.first_chunk.set()
+
+    async def update(self, user_id, alert_id, alert):
+        """An alert was created, changed, or deleted (alert None)"""
+        self.engine.update(user_id, alert_id, alert)
+        if alert:
+            self.poll_soon(pairs_of(alert))
+        if self.streams:
+            await self.streams.sync(self.engine.pairs())
+
+    def poll_soon(self, pairs):
+        """New pairs get polled right away instead of waiting for the next due time"""
+        for pair in pairs:
+            self.scheduler.touch(pair)
+        self.poll_wake.set()
+
+    async def get_prices(self, pairs):
+        """{(exchange, symbol): price} for every watched pair this tick"""
+        if SNAPSHOT_MODE:
+            exchanges = list({ex for ex, _ in pairs})
+            snapshots = dict(zip(exchanges, await self.fetcher.gather(
+                [(ex, 'bulk', get_snapshot, self.sessions.get(ex), ex) for ex in exchanges])))
+            return {(ex, symbol): (snapshots[ex] or {}).get(symbol) for ex, symbol in pairs}
+        results = await self.fetcher.gather(
+            [(ex, 'single', get_price, self.sessions.get(ex), ex, self._wire(ex, symbol)) for ex, symbol in pairs])
+        return dict(zip(pairs, results))
+
+    def _wire(self, exchange, symbol):
+        wire = self._wires.get((exchange, symbol))
+        if wire is None:
+            wire = self._wires[(exchange, symbol)] = self.wire(exchange, symbol)
+        return wire
+
+    def _report(self):
+        ACTIVE_ALERTS.set(len(self.engine))
+        WATCHED_PAIRS.set(len(self.engine.pairs()))
+        for exchange, health in self.fetcher.health.items():
+            BREAKER_OPEN.set(int(health.state != 'closed'), exchange)
+
+    async def run(self):
+        """Adaptive REST polling for every pair not currently covered by a live WebSocket"""
+        await self.first_chunk.wait()
+        first_tick = True
+        engine, streams, scheduler = self.engine, self.streams, self.scheduler
+        while True:
+            now = time.monotonic()
+            watched = engine.pairs()
+            polled = []
+            for pair in scheduler.pop_due(now):
+                if pair not in watched:
+                    scheduler.forget(pair)
+                elif streams and streams.covers(pair, now):
+                    # Streamed: only look again in case the socket drops or the pair goes quiet
+                    scheduler.touch(pair, now + POLL_INTERVAL)
+                else:
+                    polled.append(pair)
+            if SNAPSHOT_MODE and polled:
+                # A bulk call prices every pair on the exchange anyway: refresh them all
+                exchanges = {ex for ex, _ in polled}
+                polled = [pair for pair in watched
+                          if pair[0] in exchanges and not (streams and streams.covers(pair, now))]
+            if polled:
+                PROFILER.start()
+                with TICK_DURATION.time():
+                    prices = await self.get_prices(polled)
+                    with EVAL_DURATION.time():
+                        for pair, price in prices.items():
+                            if price:
+                                engine.check_alerts(*pair, price)
+                                scheduler.observe(pair, price)
+                            else:
+                                scheduler.touch(pair, time.monotonic() + POLL_INTERVAL)
+                        engine.check_spreads()
+                PROFILER.stop()
+            self._report()
+            if first_tick:
+                first_tick = False
+                logging.info(f"time to first tick: {time.monotonic() - self.started:.2f}s "
+                             f"({len(engine):,} alerts)")
+            next_due = scheduler.next_due()
+            self.poll_wake.clear()
+            try:
+                await asyncio.wait_for(self.poll_wake.wait(),
+                                       POLL_MAX if next_due is None else next_due - time.monotonic())
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import os
+import time
+
+from metrics import RATE_LIMITED, SEND_FAILURES, SEND_LATENCY
+from ratelimit import TokenBucket
+
+NOTIFY_WORKERS = int(os.getenv('NOTIFY_WORKERS', '8'))
+NOTIFY_QUEUE = int(os.getenv('NOTIFY_QUEUE', '10000'))
+TELEGRAM_RATE = float(os.getenv('TELEGRAM_RATE', '25'))  # Telegram allows ~30 msg/s overall
+CHAT_INTERVAL = float(os.getenv('CHAT_INTERVAL', '1.0'))  # and ~1 msg/s per chat
+MAX_BATCH = 30  # alerts per message: 3 buttons each stays under Telegram's keyboard limit
+
+
+class Notifier:
+    """Delivery queue between alert evaluation and Telegram.
+
+    `submit()` never blocks: triggers are merged per user into one pending
+    batch and the user is queued once. Workers pace each chat, share a global
+    token bucket and honour retry_after on 429s. `send(user_id, batch)` does
+    the actual Telegram call; a batch is [(alert_id, alert, price), ...].
+    """
+
+    def __init__(self, send, workers=NOTIFY_WORKERS, queue_size=NOTIFY_QUEUE,
+                 rate=TELEGRAM_RATE, chat_interval=CHAT_INTERVAL):
+        self.send = send
+        self.workers = workers
+        self.chat_interval = chat_interval
+        self.bucket = TokenBucket(rate)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._pending = {}  # user_id -> {alert_id: (alert_id, alert, price)}
+        self._next_send = {}  # user_id -> monotonic time the chat may be messaged again
+        self._tasks = []
+
+    def submit(self, user_id, alert_id, alert, price):
+        batch = self._pending.get(user_id)
+        if batch is not None:
+            batch[alert_id] = (alert_id, alert, price)  # already queued: merge
+            return
+        try:
+            self.queue.put_nowait(user_id)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logging.warning(f"notify queue full, dropped alert {alert_id} for {user_id}")
+            return
+        self._pending[user_id] = {alert_id: (alert_id, alert, price)}
+
+    def _requeue(self, user_id):
+        try:
+            self.queue.put_nowait(user_id)
+        except asyncio.QueueFull:
+            self.dropped += len(self._pending.pop(user_id, ()))
+
+    def _forget(self, user_id):
+        # The chat's pacing has run out; keep _next_send to the chats that are still active
+        if user_id not in self._pending:
+            self._next_send.pop(user_id, None)
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self, timeout=5):
+        """Give queued messages `timeout` seconds to go out, then stop the workers"""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            user_id = await self.queue.get()
+            try:
+                wait = self._next_send.get(user_id, 0) - time.monotonic()
+                if wait > 0:
+                    # Chat is paced: come back later instead of tying up a worker
+                    loop.call_later(wait, self._requeue, user_id)
+                    continue
+                pending = self._pending.get(user_id)
+                if not pending:
+                    self._pending.pop(user_id, None)
+                    continue
+                batch = list(pending.values())[:MAX_BATCH]
+                await self.bucket.acquire()
+                self._next_send[user_id] = time.monotonic() + self.chat_interval
+                try:
+                    with SEND_LATENCY.time():
+                        await self.send(user_id, batch)
+                except Exception as e:
+                    retry_after = getattr(e, 'retry_after', None)
+                    if retry_after is None:
+                        SEND_FAILURES.inc()
+                        logging.warning(f"send to {user_id} failed: {e!r}")
+                    else:
+                        RATE_LIMITED.inc()
+                        # 429: back off this chat and everyone else, then retry the batch
+                        self._next_send[user_id] = time.monotonic() + retry_after
+                        self.bucket.pause(retry_after)
+                        loop.call_later(retry_after, self._requeue, user_id)
+                        continue
+                for entry in batch:
+                    # A re-trigger merged in while we were sending replaced the entry: keep it
+                    if pending.get(entry[0]) is entry:
+                        del pending[entry[0]]
+                if pending:
+                    loop.call_later(self.chat_interval, self._requeue, user_id)
+                else:
+                    self._pending.pop(user_id, None)
+                    loop.call_later(max(self._next_send[user_id] - time.monotonic(), 0), self._forget, user_id)
+            finally:
+                self.queue.task_done()
@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens/second, bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, n=1):
+        self._refill()
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    async def acquire(self, n=1):
+        # The lock keeps waiters first-come first-served
+        async with self._lock:
+            while not self.try_acquire(n):
+                await asyncio.sleep((n - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Hold everything back for `seconds`, e.g. after a 429 with retry_after"""
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
@@ -0,0 +1,214 @@
+"""Replay recorded prices through the alert engine at full speed, to tune alerts and measure throughput.
+
+    python replay.py ticks.csv --db alerts.db
+    python replay.py ticks.csv --convert ticks.bin
+    python replay.py ticks.bin --db alerts.db --cooldown 60 --hysteresis 0.5 --fires fires.csv
+
+Ticks are CSV rows `time,exchange,symbol,price` (unix seconds; a header row
+is skipped) or the compact binary form written by --convert, which reads
+several times faster. They must be in time order; nothing sleeps between
+them. Alerts come from an alerts.db as the bot stores it and start armed.
+The report gives, per alert, when it would have fired, and the number of
+Telegram messages the bot would have sent after merging a user's alerts
+the way Notifier does.
+"""
+import argparse
+import csv
+import json
+import sqlite3
+import struct
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from engine import ALERT_ENGINE, AlertEngine
+from exchanges import canonical_symbol
+from notifier import CHAT_INTERVAL, MAX_BATCH
+from storage import COLUMNS, from_row
+from triggers import ARMED, rearm
+
+# Binary ticks: MAGIC, RECORDs (time, pair number, price), the pairs as JSON, the JSON's length
+MAGIC = b'ALERTTK1'
+RECORD = struct.Struct('<dId')
+FOOTER = struct.Struct('<Q')
+CHUNK = 65536  # records per read / write
+
+
+def read_csv(path):
+    pairs = {}  # raw (exchange, symbol) -> canonical pair, so every tick of a pair shares one tuple
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            try:
+                now = float(row[0])
+            except (IndexError, ValueError):
+                continue  # header or blank line
+            pair = pairs.get((row[1], row[2]))
+            if pair is None:
+                pair = pairs[(row[1], row[2])] = (row[1].lower(), canonical_symbol(row[2]))
+            yield now, pair, float(row[3])
+
+
+def read_bin(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: not a binary tick file")
+        end = f.seek(-FOOTER.size, 2)
+        (size,) = FOOTER.unpack(f.read(FOOTER.size))
+        end = f.seek(end - size)
+        pairs = [tuple(pair) for pair in json.loads(f.read(size))]
+        f.seek(len(MAGIC))
+        left = end - len(MAGIC)
+        while left > 0:
+            chunk = f.read(min(left, CHUNK * RECORD.size))
+            left -= len(chunk)
+            for now, code, price in RECORD.iter_unpack(chunk):
+                yield now, pairs[code], price
+
+
+def write_bin(path, ticks):
+    """Write (time, pair, price) ticks in the binary form; returns how many"""
+    codes = {}
+    n = 0
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        buf = bytearray()
+        for now, pair, price in ticks:
+            code = codes.get(pair)
+            if code is None:
+                code = codes[pair] = len(codes)
+            buf += RECORD.pack(now, code, price)
+            n += 1
+            if len(buf) >= CHUNK * RECORD.size:
+                f.write(buf)
+                buf.clear()
+        f.write(buf)
+        footer = json.dumps(list(codes)).encode()
+        f.write(footer)
+        f.write(FOOTER.pack(len(footer)))
+    return n
+
+
+def read_ticks(path):
+    with open(path, 'rb') as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    return read_bin(path) if binary else read_csv(path)
+
+
+class Backtest:
+    """Runs ticks through an AlertEngine and records what the live bot would have sent.
+
+    Each firing is kept per alert as (time, price). Messages are counted
+    per user as Notifier paces them: one chat gets at most one message per
+    `chat_interval`, and alerts firing before a message goes out -- on the
+    same tick included -- join it, up to MAX_BATCH alerts per message.
+    """
+
+    def __init__(self, rows, engine=ALERT_ENGINE, chat_interval=CHAT_INTERVAL):
+        self.chat_interval = chat_interval
+        self.fires = defaultdict(list)  # (user_id, alert_id) -> [(time, price)]
+        self.messages = 0
+        self.rearms = 0
+        self.ticks = 0
+        self.evaluated = 0
+        self._chats = {}  # user_id -> (time the chat is free again, send time of the last message, its alerts)
+        self.engine = AlertEngine(self._fired, self._state, engine=engine)
+        self.engine.add_many(rows)
+
+    def _fired(self, user_id, alert_id, alert, price):
+        now = alert['fired_at']
+        self.fires[(user_id, alert_id)].append((now, price))
+        free, sent, size = self._chats.get(user_id, (0, None, 0))
+        if sent is not None and now <= sent and size < MAX_BATCH:
+            self._chats[user_id] = (free, sent, size + 1)  # merged into the message not yet sent
+            return
+        sent = max(now, free)
+        self._chats[user_id] = (sent + self.chat_interval, sent, 1)
+        self.messages += 1
+
+    def _state(self, user_id, alert_id, alert):
+        if alert['state'] == ARMED:
+            self.rearms += 1
+
+    def run(self, ticks):
+        # No alert is deleted during a replay, so the watched pairs stay put
+        watched = set(self.engine.pairs())
+        on_price = self.engine.on_price
+        n = evaluated = 0
+        for now, pair, price in ticks:
+            n += 1
+            if pair in watched:
+                evaluated += 1
+                on_price(*pair, price, now)
+        self.ticks += n
+        self.evaluated += evaluated
+
+
+def load_rows(path, cooldown=None, hysteresis=None):
+    """Alerts of an alerts.db, opened read-only: a replay never migrates or creates the file"""
+    conn = sqlite3.connect(Path(path).absolute().as_uri() + '?mode=ro', uri=True)
+    try:
+        rows = [from_row(row) for row in conn.execute(f"SELECT {', '.join(COLUMNS)} FROM alerts")]
+    finally:
+        conn.close()
+    for _, _, alert in rows:
+        rearm(alert)
+        if cooldown is not None:
+            alert['cooldown'] = cooldown
+        if hysteresis is not None:
+            alert['hysteresis'] = hysteresis
+    return rows
+
+
+def stamp(t):
+    return datetime.fromtimestamp(t, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('ticks', help="CSV or binary tick file")
+    parser.add_argument('--db', default='alerts.db', help="alerts to replay (default: %(default)s)")
+    parser.add_argument('--convert', metavar='OUT', help="write the ticks to OUT in binary form and exit")
+    parser.add_argument('--engine', default=ALERT_ENGINE, choices=['index', 'columnar'])
+    parser.add_argument('--cooldown', type=float, help="seconds between firings, for every alert")
+    parser.add_argument('--hysteresis', type=float, help="%% of the limit to re-arm (spread alerts: spread points), for every alert")
+    parser.add_argument('--fires', metavar='CSV', help="write every firing to CSV")
+    parser.add_argument('--top', type=int, default=20, help="alerts listed in the report (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.convert:
+        started = time.perf_counter()
+        n = write_bin(args.convert, read_ticks(args.ticks))
+        print(f"{n:,} ticks written to {args.convert} in {time.perf_counter() - started:.1f}s")
+        return
+
+    try:
+        rows = load_rows(args.db, args.cooldown, args.hysteresis)
+    except sqlite3.Error as e:
+        parser.error(f"{args.db}: {e} (a database from an older bot is converted when bot.py next starts)")
+    if not rows:
+        parser.error(f"no alerts in {args.db}")
+    backtest = Backtest(rows, args.engine)
+    started = time.perf_counter()
+    backtest.run(read_ticks(args.ticks))
+    elapsed = time.perf_counter() - started
+
+    fires = backtest.fires
+    print(f"{len(rows):,} alerts, {backtest.ticks:,} ticks ({backtest.evaluated:,} on watched pairs) "
+          f"in {elapsed:.2f}s: {backtest.ticks / elapsed * 60:,.0f} ticks/min")
+    print(f"{sum(map(len, fires.values())):,} firings of {len(fires):,} alerts, {backtest.rearms:,} re-arms, "
+          f"{backtest.messages:,} messages to {len({uid for uid, _ in fires}):,} users")
+    if fires:
+        print(f"\n{'user':>12}  {'alert':<40} {'fires':>6}  {'first':<19}  {'last':<19}")
+        for (user_id, alert_id), times in sorted(fires.items(), key=lambda item: -len(item[1]))[:args.top]:
+            print(f"{user_id:>12}  {alert_id[:40]:<40} {len(times):>6}  {stamp(times[0][0])}  {stamp(times[-1][0])}")
+    if args.fires:
+        with open(args.fires, 'w', newline='') as f:
+            out = csv.writer(f)
+            out.writerow(['user_id', 'alert_id', 'time', 'price'])
+            for (user_id, alert_id), times in fires.items():
+                out.writerows((user_id, alert_id, now, price) for now, price in times)
+
+
+if __name__ == '__main__':
+    main()
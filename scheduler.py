@@ -0,0 +1,84 @@
+import heapq
+import math
+import os
+import time
+
+POLL_MIN = float(os.getenv('POLL_MIN', '1'))  # seconds, for pairs about to trigger
+POLL_MAX = float(os.getenv('POLL_MAX', '60'))  # seconds, for pairs far from every limit
+POLL_SIGMAS = 3.0  # poll again before a move this many standard deviations could reach the limit
+DEFAULT_VOL = 2e-4  # per-sqrt(second) volatility assumed until we have observations (~6%/day)
+MIN_VOL = 2e-5
+VOL_ALPHA = 0.1  # EWMA weight of the newest return
+
+
+class PollScheduler:
+    """Decides when each (exchange, symbol) is next polled.
+
+    The interval is the time a POLL_SIGMAS move needs to reach the nearest
+    untriggered limit given the pair's recent volatility -- (gap / (k * vol))^2
+    for a random walk -- clamped to [POLL_MIN, POLL_MAX]. Due times live in a
+    heap; `touch` makes a pair due now (e.g. a new alert).
+    """
+
+    def __init__(self, nearest, poll_min=POLL_MIN, poll_max=POLL_MAX):
+        self.nearest = nearest  # (pair, price) -> distance to the closest limit, or None
+        self.poll_min = poll_min
+        self.poll_max = poll_max
+        self._heap = []
+        self._due = {}  # pair -> due time of its live heap entry
+        self._last = {}  # pair -> (time, price)
+        self._var = {}  # pair -> EWMA of squared log-return per second
+
+    def touch(self, pair, when=None):
+        """Make `pair` due no later than `when` (default: now)"""
+        when = time.monotonic() if when is None else when
+        if pair not in self._due or when < self._due[pair]:
+            self._schedule(pair, when)
+
+    def _schedule(self, pair, when):
+        self._due[pair] = when
+        heapq.heappush(self._heap, (when, pair))
+
+    def forget(self, pair):
+        self._due.pop(pair, None)
+        self._last.pop(pair, None)
+        self._var.pop(pair, None)
+
+    def next_due(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)  # stale entry
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None):
+        """Pairs whose poll time has come, removed from the schedule"""
+        now = time.monotonic() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, pair = heapq.heappop(self._heap)
+            if self._due.get(pair) == when:
+                del self._due[pair]
+                due.append(pair)
+        return due
+
+    def volatility(self, pair):
+        var = self._var.get(pair)
+        return DEFAULT_VOL if var is None else max(math.sqrt(var), MIN_VOL)
+
+    def observe(self, pair, price, now=None):
+        """Record a fresh price and schedule the pair's next poll from it"""
+        now = time.monotonic() if now is None else now
+        last = self._last.get(pair)
+        if last and now > last[0] and last[1] > 0:
+            r = math.log(price / last[1])
+            sample = r * r / (now - last[0])
+            var = self._var.get(pair)
+            self._var[pair] = sample if var is None else VOL_ALPHA * sample + (1 - VOL_ALPHA) * var
+        self._last[pair] = (now, price)
+        self._schedule(pair, now + self.interval(pair, price))
+
+    def interval(self, pair, price):
+        gap = self.nearest(pair, price)
+        if gap is None or price <= 0:
+            return self.poll_max
+        t = (gap / price / (POLL_SIGMAS * self.volatility(pair))) ** 2
+        return min(max(t, self.poll_min), self.poll_max)
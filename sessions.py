@@ -0,0 +1,51 @@
+import os
+import aiohttp
+
+# POOL SETTINGS (override via env)
+HTTP_LIMIT_PER_HOST = int(os.getenv('HTTP_LIMIT_PER_HOST', '8'))
+HTTP_DNS_TTL = int(os.getenv('HTTP_DNS_TTL', '300'))
+HTTP_KEEPALIVE = float(os.getenv('HTTP_KEEPALIVE', '30'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '5'))
+
+
+class SessionManager:
+    """Long-lived keep-alive sessions, one connection pool per exchange host"""
+
+    def __init__(self, limit_per_host=HTTP_LIMIT_PER_HOST, dns_ttl=HTTP_DNS_TTL,
+                 keepalive=HTTP_KEEPALIVE, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 read_timeout=HTTP_READ_TIMEOUT):
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive = keepalive
+        self.timeout = aiohttp.ClientTimeout(total=connect_timeout + read_timeout,
+                                             connect=connect_timeout,
+                                             sock_read=read_timeout)
+        # WebSockets stay open indefinitely: only the handshake is bounded
+        self.ws_timeout = aiohttp.ClientTimeout(total=None, connect=connect_timeout)
+        self._sessions = {}
+
+    def get(self, name):
+        return self._get(name, self.timeout)
+
+    def get_ws(self, name):
+        return self._get(f"{name}:ws", self.ws_timeout)
+
+    def _get(self, name, timeout):
+        # Sessions are created lazily so they bind to the running event loop
+        session = self._sessions.get(name)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive,
+            )
+            session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._sessions[name] = session
+        return session
+
+    async def close(self):
+        for session in self._sessions.values():
+            if not session.closed:
+                await session.close()
+        self._sessions.clear()
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import zlib
+
+from catalog import SymbolCatalog
+from fetcher import EXCHANGE_LIMITS, FetchScheduler, share_limits
+from metrics import METRICS_PORT, start_server
+from engine import pair_of
+from monitor import Monitor
+from sessions import SessionManager
+
+MONITOR_SHARDS = int(os.getenv('MONITOR_SHARDS', '0'))  # monitor worker processes; 0 = monitor in the bot process
+SUPERVISE_INTERVAL = 5  # seconds between worker liveness checks
+RECEIVE_BATCH = 1000  # messages taken off a queue per thread hop
+# The front end and every worker call the exchanges from one IP: each gets an equal share of the budget
+SHARD_LIMITS = share_limits(EXCHANGE_LIMITS, MONITOR_SHARDS + 1) if MONITOR_SHARDS else EXCHANGE_LIMITS
+
+
+def shard_of(alert, shards):
+    """Stable partition by canonical symbol, the same in every process and run.
+    Every exchange's price of a symbol lands in one worker, so spread alerts see both legs."""
+    return zlib.crc32(pair_of(alert)[1].encode()) % shards
+
+
+def _receive(q, timeout=1.0):
+    """Block up to `timeout` for one message, then take whatever else is queued"""
+    try:
+        batch = [q.get(timeout=timeout)]
+    except queue.Empty:
+        return []
+    while len(batch) < RECEIVE_BATCH:
+        try:
+            batch.append(q.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _worker(shard, inbox, outbox, limits):
+    logging.basicConfig(level=logging.INFO, format=f"shard {shard}: %(levelname)s:%(name)s:%(message)s", force=True)
+    asyncio.run(_serve(shard, inbox, outbox, limits))
+
+
+async def _serve(shard, inbox, outbox, limits):
+    sessions = SessionManager()
+    # Wire spellings from the catalog the front end keeps on disk
+    catalog = SymbolCatalog()
+    catalog.load_cache()
+    # Copies: the queue pickles in a background thread, after the alert may have moved on
+    monitor = Monitor(sessions, FetchScheduler(limits),
+                      lambda uid, aid, alert, price: outbox.put(('trigger', uid, aid, dict(alert), price)),
+                      lambda uid, aid, alert: outbox.put(('state', uid, aid, dict(alert))),
+                      wire=catalog.wire)
+    # Each worker serves its own /metrics next to the front end's
+    metrics_runner = await start_server(port=METRICS_PORT + 1 + shard) if METRICS_PORT else None
+    await monitor.start()
+    try:
+        while True:
+            for kind, *args in await asyncio.to_thread(_receive, inbox):
+                if kind == 'add':
+                    await monitor.add_many(*args)
+                elif kind == 'update':
+                    await monitor.update(*args)
+                elif kind == 'loaded':
+                    monitor.loaded()
+                elif kind == 'stop':
+                    return
+    finally:
+        await monitor.close()
+        await sessions.close()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+
+
+class ShardedMonitor:
+    """Monitor's interface, backed by `shards` worker processes.
+
+    Worker k owns every symbol with shard_of(alert) == k and runs its own
+    Monitor -- sessions, rate limits, streams and alert index -- so capacity
+    grows with cores. Alert changes go to the owning worker over its
+    multiprocessing queue; triggers and state changes come back on one shared
+    queue and reach on_trigger / on_state on this event loop. A worker that
+    dies is restarted and re-sent its partition from `alerts`. Each worker
+    rate-limits itself to 1/(shards + 1) of every exchange's budget, the
+    front end keeping the last share, so together they stay inside it.
+    """
+
+    def __init__(self, shards, on_trigger, on_state, alerts):
+        self.shards = shards
+        self.limits = share_limits(EXCHANGE_LIMITS, shards + 1)
+        self.on_trigger = on_trigger
+        self.on_state = on_state
+        self.alerts = alerts
+        self._ctx = multiprocessing.get_context('spawn')
+        self._outbox = self._ctx.Queue()
+        self._inboxes = [None] * shards
+        self._procs = [None] * shards
+        self._tasks = []
+        self._loaded = False
+
+    def _spawn(self, shard):
+        inbox = self._ctx.Queue()
+        proc = self._ctx.Process(target=_worker, args=(shard, inbox, self._outbox, self.limits),
+                                 name=f"monitor-shard-{shard}", daemon=True)
+        proc.start()
+        self._inboxes[shard], self._procs[shard] = inbox, proc
+
+    async def start(self):
+        for shard in range(self.shards):
+            self._spawn(shard)
+        self._tasks = [asyncio.create_task(self._collect()), asyncio.create_task(self._supervise())]
+        logging.info(f"monitor sharded over {self.shards} worker processes")
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        for inbox in self._inboxes:
+            inbox.put(('stop',))
+        for proc in self._procs:
+            await asyncio.to_thread(proc.join, 5)
+            if proc.is_alive():
+                proc.terminate()
+
+    def _partition(self, rows):
+        parts = [[] for _ in range(self.shards)]
+        for user_id, alert_id, alert in rows:
+            parts[shard_of(alert, self.shards)].append((user_id, alert_id, dict(alert)))
+        return parts
+
+    async def add_many(self, rows):
+        # Every worker gets its part, even an empty one, so all of them start polling
+        for inbox, part in zip(self._inboxes, self._partition(rows)):
+            inbox.put(('add', part))
+
+    def loaded(self):
+        self._loaded = True
+        for inbox in self._inboxes:
+            inbox.put(('loaded',))
+
+    async def update(self, user_id, alert_id, alert):
+        if alert is None:
+            # The pair is gone with the alert: let every worker drop it
+            for inbox in self._inboxes:
+                inbox.put(('update', user_id, alert_id, None))
+        else:
+            self._inboxes[shard_of(alert, self.shards)].put(('update', user_id, alert_id, dict(alert)))
+
+    async def _collect(self):
+        while True:
+            for kind, *args in await asyncio.to_thread(_receive, self._outbox):
+                if kind == 'trigger':
+                    self.on_trigger(*args)
+                else:
+                    self.on_state(*args)
+
+    async def _supervise(self):
+        while True:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            for shard, proc in enumerate(self._procs):
+                if proc.is_alive():
+                    continue
+                logging.error(f"monitor shard {shard} exited with {proc.exitcode}, restarting")
+                self._spawn(shard)
+                rows = [(uid, aid, alert) for uid, user_alerts in self.alerts.items()
+                        for aid, alert in user_alerts.items()]
+                self._inboxes[shard].put(('add', self._partition(rows)[shard]))
+                if self._loaded:
+                    self._inboxes[shard].put(('loaded',))
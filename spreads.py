@@ -0,0 +1,114 @@
+from collections import defaultdict
+
+from exchanges import canonical_symbol
+from triggers import watch_level
+
+
+def is_spread(alert):
+    return bool(alert.get('exchange_b'))
+
+
+def legs(alert):
+    """The two (exchange, canonical symbol) pairs a spread alert compares"""
+    symbol = canonical_symbol(alert['symbol'])
+    return (alert['exchange'], symbol), (alert['exchange_b'], symbol)
+
+
+def spread_pct(a, b):
+    return abs(a - b) / min(a, b) * 100
+
+
+class SpreadBook:
+    """Spread alerts: "SYMBOL on exchange A vs exchange B diverges by more than limit %".
+
+    Every price the monitor gets, polled or streamed, is written into one
+    symbols x exchanges matrix with `observe`; only rows with a spread alert
+    are kept. `crossed()` re-checks just the alerts on rows that changed since
+    the last call, so spreads ride on fetches the monitor makes anyway.
+    Like ThresholdIndex, alerts are filed at their current watch_level.
+    """
+
+    def __init__(self):
+        self.matrix = {}  # symbol -> {exchange: price}
+        self.changed = set()  # symbols whose row changed since the last crossed()
+        self._alerts = defaultdict(dict)  # symbol -> {(user_id, alert_id): (exchange_a, exchange_b, direction, level)}
+        self._where = {}  # (user_id, alert_id) -> symbol
+        self._legs = defaultdict(int)  # (exchange, symbol) -> alerts using it
+
+    def __len__(self):
+        return len(self._where)
+
+    def pairs(self):
+        return self._legs.keys()
+
+    def add(self, user_id, alert_id, alert):
+        """File or re-file an alert; re-filing keeps the symbol's row and its prices"""
+        key = (user_id, alert_id)
+        leg_a, leg_b = legs(alert)
+        symbol = leg_a[1]
+        if key in self._where:
+            self._unlink(key, keep_row=self._where[key] == symbol)
+        self._alerts[symbol][key] = (leg_a[0], leg_b[0], *watch_level(alert))
+        self._where[key] = symbol
+        self.matrix.setdefault(symbol, {})
+        self.changed.add(symbol)
+        for leg in (leg_a, leg_b):
+            self._legs[leg] += 1
+
+    def discard(self, user_id, alert_id):
+        key = (user_id, alert_id)
+        if key not in self._where:
+            return False
+        self._unlink(key)
+        return True
+
+    def _unlink(self, key, keep_row=False):
+        symbol = self._where.pop(key)
+        exchange_a, exchange_b, _, _ = self._alerts[symbol].pop(key)
+        for leg in ((exchange_a, symbol), (exchange_b, symbol)):
+            self._legs[leg] -= 1
+            if not self._legs[leg]:
+                del self._legs[leg]
+        if not self._alerts[symbol] and not keep_row:
+            del self._alerts[symbol]
+            del self.matrix[symbol]
+            self.changed.discard(symbol)
+
+    def observe(self, exchange, symbol, price):
+        row = self.matrix.get(symbol)
+        if row is not None and row.get(exchange) != price:
+            row[exchange] = price
+            self.changed.add(symbol)
+
+    def crossed(self):
+        """[(user_id, alert_id, spread %)] for alerts on changed rows whose watched level is crossed"""
+        hits = []
+        for symbol in self.changed:
+            row = self.matrix[symbol]
+            for key, (exchange_a, exchange_b, direction, level) in self._alerts[symbol].items():
+                a, b = row.get(exchange_a), row.get(exchange_b)
+                if not a or not b:
+                    continue
+                spread = spread_pct(a, b)
+                if spread >= level if direction == 'above' else spread <= level:
+                    hits.append((*key, spread))
+        self.changed = set()
+        return hits
+
+    def nearest(self, pair, price):
+        """How far `pair` could move before one of its spread alerts crosses, as a price gap.
+        Half the spread's room, since the other leg moves too; 0 while the other leg is unknown."""
+        exchange, symbol = pair
+        if pair not in self._legs:
+            return None
+        row = self.matrix.get(symbol, {})
+        gaps = []
+        for exchange_a, exchange_b, direction, level in self._alerts[symbol].values():
+            if exchange not in (exchange_a, exchange_b):
+                continue
+            other = row.get(exchange_b if exchange == exchange_a else exchange_a)
+            if not other:
+                return 0
+            room = level - spread_pct(price, other) if direction == 'above' else spread_pct(price, other) - level
+            gaps.append(max(room, 0) / 100 * min(price, other) / 2)
+        return min(gaps) if gaps else None
@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+FLUSH_INTERVAL = float(os.getenv('DB_FLUSH_INTERVAL', '0.25'))  # seconds between batched commits
+LOAD_CHUNK = int(os.getenv('DB_LOAD_CHUNK', '20000'))  # rows per fetchmany at startup
+LEGACY_EXCHANGE = 'binance'  # for alerts saved by bot_working.py, which priced everything from CoinGecko
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS alerts (
+    user_id INTEGER NOT NULL,
+    alert_id TEXT NOT NULL,
+    exchange TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    limit_price REAL NOT NULL,
+    muted INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'armed',
+    fired_at REAL,
+    hysteresis REAL,
+    cooldown REAL,
+    exchange_b TEXT,
+    PRIMARY KEY (user_id, alert_id)
+);
+CREATE INDEX IF NOT EXISTS alerts_pair ON alerts (exchange, symbol);
+'''
+# The (user_id, alert_id) primary key doubles as the user_id index
+COLUMNS = ('user_id', 'alert_id', 'exchange', 'symbol', 'direction', 'limit_price',
+           'muted', 'state', 'fired_at', 'hysteresis', 'cooldown', 'exchange_b')
+OPTIONAL = ('fired_at', 'hysteresis', 'cooldown', 'exchange_b')  # exchange_b: second leg of a spread alert
+UPSERT = f"INSERT OR REPLACE INTO alerts ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+
+def connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')  # WAL + NORMAL: durable across app crashes, no fsync per commit
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-16000')
+    conn.execute('PRAGMA busy_timeout=5000')
+    return conn
+
+
+def to_row(user_id, alert_id, alert):
+    return (user_id, alert_id, alert['exchange'], alert['symbol'], alert['direction'], alert['limit'],
+            int(bool(alert.get('muted', False))), alert.get('state', 'armed'),
+            alert.get('fired_at'), alert.get('hysteresis'), alert.get('cooldown'), alert.get('exchange_b'))
+
+
+def from_row(row):
+    user_id, alert_id, exchange, symbol, direction, limit, muted, state, *optional = row
+    alert = {'exchange': exchange, 'symbol': symbol, 'limit': limit, 'direction': direction,
+             'muted': bool(muted), 'state': state}
+    for name, value in zip(OPTIONAL, optional):
+        if value is not None:
+            alert[name] = value
+    return user_id, alert_id, alert
+
+
+def _add_columns(conn):
+    """Columns newer than an existing table"""
+    columns = [r[1] for r in conn.execute("PRAGMA table_info(alerts)")]
+    if columns and 'exchange_b' not in columns:
+        conn.execute("ALTER TABLE alerts ADD COLUMN exchange_b TEXT")
+
+
+def _legacy_rows(conn):
+    """Rows of the old JSON table as to_row tuples; alerts from bot_working.py had no exchange"""
+    rows, defaulted, skipped = [], 0, 0
+    for user_id, alert_id, data, *muted in conn.execute("SELECT * FROM alerts_json"):
+        try:
+            alert = json.loads(data)
+            if 'exchange' not in alert:
+                alert['exchange'] = LEGACY_EXCHANGE
+                defaulted += 1
+            if muted:
+                alert['muted'] = bool(muted[0])
+            rows.append(to_row(user_id, alert_id, alert))
+        except (ValueError, TypeError, KeyError) as e:
+            skipped += 1
+            logging.warning(f"alert {user_id}/{alert_id} not migrated: {e!r}")
+    if defaulted:
+        logging.info(f"{defaulted} alerts without an exchange migrated as {LEGACY_EXCHANGE}")
+    if skipped:
+        logging.warning(f"{skipped} unreadable alerts left out of the migration")
+    return rows
+
+
+def migrate(conn):
+    """Bring the alerts table up to SCHEMA.
+
+    The old (user_id, alert_id, data JSON, muted) table is converted in one
+    transaction: renamed to alerts_json, copied into the new table, dropped.
+    An alerts_json left behind by an interrupted conversion is picked up again.
+    """
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    columns = [r[1] for r in conn.execute("PRAGMA table_info(alerts)")]
+    if 'data' not in columns and 'alerts_json' not in tables:
+        with conn:
+            _add_columns(conn)
+        conn.executescript(SCHEMA)
+        return
+    logging.info("migrating alerts.db from JSON rows to columns")
+    # executescript would commit half-way: every statement goes through execute in one transaction
+    conn.execute("BEGIN")
+    try:
+        if 'data' in columns:
+            conn.execute("ALTER TABLE alerts RENAME TO alerts_json")
+        for statement in SCHEMA.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        _add_columns(conn)
+        conn.executemany(UPSERT, _legacy_rows(conn))
+        conn.execute("DROP TABLE alerts_json")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+class AlertStore:
+    """Write-behind alert persistence.
+
+    `save` / `delete` only record the latest wanted state per alert and return
+    immediately; a writer thread with its own connection commits everything
+    pending in one transaction every `flush_interval` seconds, so the event
+    loop never waits on SQLite or fsync.
+    """
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._pending = {}  # (user_id, alert_id) -> row, or None to delete
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        conn = connect(path)
+        migrate(conn)
+        conn.close()
+        self._thread = threading.Thread(target=self._writer, name='alert-writer', daemon=True)
+        self._thread.start()
+
+    def save(self, user_id, alert_id, alert):
+        row = to_row(user_id, alert_id, alert)
+        with self._lock:
+            self._pending[(user_id, alert_id)] = row
+
+    def delete(self, user_id, alert_id):
+        with self._lock:
+            self._pending[(user_id, alert_id)] = None
+
+    def load(self, chunk=LOAD_CHUNK):
+        """Yield lists of (user_id, alert_id, alert), `chunk` rows at a time"""
+        conn = connect(self.path)
+        try:
+            cursor = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM alerts")
+            while True:
+                rows = cursor.fetchmany(chunk)
+                if not rows:
+                    return
+                yield [from_row(row) for row in rows]
+        finally:
+            conn.close()
+
+    def close(self):
+        """Flush what is pending and stop the writer"""
+        self._stop.set()
+        self._thread.join()
+
+    def _flush(self, conn):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        upserts = [row for row in pending.values() if row is not None]
+        deletes = [key for key, row in pending.items() if row is None]
+        try:
+            with conn:
+                conn.executemany(UPSERT, upserts)
+                conn.executemany("DELETE FROM alerts WHERE user_id=? AND alert_id=?", deletes)
+        except sqlite3.Error as e:
+            logging.error(f"alert flush failed ({len(pending)} changes), retrying: {e}")
+            with self._lock:
+                # Keep anything that changed again since
+                self._pending = {**pending, **self._pending}
+
+    def _writer(self):
+        conn = connect(self.path)
+        try:
+            while not self._stop.wait(self.flush_interval):
+                self._flush(conn)
+            self._flush(conn)
+        finally:
+            conn.close()
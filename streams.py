@@ -0,0 +1,392 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import time
+import zlib
+from collections import defaultdict
+
+import aiohttp
+
+from exchanges import canonical_symbol, wire_symbol
+
+WS_BACKOFF_MIN = float(os.getenv('WS_BACKOFF_MIN', '1'))
+WS_BACKOFF_MAX = float(os.getenv('WS_BACKOFF_MAX', '60'))
+# A streamed pair with no update for this long is polled over REST again
+STREAM_STALE = float(os.getenv('STREAM_STALE', '30'))
+
+
+def _chunks(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class Protocol:
+    """Public ticker WebSocket dialect of one exchange"""
+    name = None
+    url = None
+    ping_interval = None
+    batch = 10
+    max_streams = 200  # symbols per connection where the exchange publishes no cap
+
+    async def connect_url(self, session):
+        return os.getenv(f"WS_URL_{self.name.upper()}", self.url)
+
+    def subscribe(self, wires):
+        return []
+
+    def unsubscribe(self, wires):
+        return []
+
+    def ping(self):
+        return None
+
+    def reply(self, msg):
+        """Answer to a server-initiated ping, if the dialect needs one"""
+        return None
+
+    def parse(self, msg):
+        """[(wire symbol, price), ...] carried by one message"""
+        return []
+
+
+class Binance(Protocol):
+    name = 'binance'
+    url = "wss://stream.binance.com:9443/ws"
+    batch = 100
+    max_streams = 1024
+
+    def _msg(self, method, wires):
+        return [{'method': method, 'params': [f"{w.lower()}@miniTicker" for w in chunk],
+                 'id': int(time.time() * 1000)} for chunk in _chunks(wires, self.batch)]
+
+    def subscribe(self, wires):
+        return self._msg('SUBSCRIBE', wires)
+
+    def unsubscribe(self, wires):
+        return self._msg('UNSUBSCRIBE', wires)
+
+    def parse(self, msg):
+        if isinstance(msg, dict) and msg.get('e') == '24hrMiniTicker':
+            return [(msg['s'], float(msg['c']))]
+        return []
+
+
+class Bybit(Protocol):
+    name = 'bybit'
+    url = "wss://stream.bybit.com/v5/public/spot"
+    ping_interval = 20
+
+    def subscribe(self, wires):
+        return [{'op': 'subscribe', 'args': [f"tickers.{w}" for w in chunk]}
+                for chunk in _chunks(wires, self.batch)]
+
+    def unsubscribe(self, wires):
+        return [{'op': 'unsubscribe', 'args': [f"tickers.{w}" for w in chunk]}
+                for chunk in _chunks(wires, self.batch)]
+
+    def ping(self):
+        return {'op': 'ping'}
+
+    def parse(self, msg):
+        if isinstance(msg, dict) and str(msg.get('topic', '')).startswith('tickers.'):
+            data = msg['data']
+            return [(data['symbol'], float(data['lastPrice']))]
+        return []
+
+
+class HTX(Protocol):
+    name = 'htx'
+    url = "wss://api.huobi.pro/ws"
+
+    def subscribe(self, wires):
+        return [{'sub': f"market.{w}.ticker", 'id': w} for w in wires]
+
+    def unsubscribe(self, wires):
+        return [{'unsub': f"market.{w}.ticker", 'id': w} for w in wires]
+
+    def reply(self, msg):
+        if isinstance(msg, dict) and 'ping' in msg:
+            return {'pong': msg['ping']}
+        return None
+
+    def parse(self, msg):
+        if isinstance(msg, dict) and 'tick' in msg and str(msg.get('ch', '')).endswith('.ticker'):
+            return [(msg['ch'].split('.')[1], float(msg['tick']['close']))]
+        return []
+
+
+class KuCoin(Protocol):
+    name = 'kucoin'
+    url = "https://api.kucoin.com/api/v1/bullet-public"
+    ping_interval = 18
+    batch = 100
+    max_streams = 400
+
+    async def connect_url(self, session):
+        override = os.getenv('WS_URL_KUCOIN')
+        if override:
+            return override
+        # KuCoin hands out a short-lived token + endpoint for every connection
+        async with session.post(self.url) as resp:
+            data = (await resp.json(content_type=None))['data']
+        server = data['instanceServers'][0]
+        self.ping_interval = server.get('pingInterval', 18000) / 1000 * 0.9
+        return f"{server['endpoint']}?token={data['token']}"
+
+    def _msg(self, kind, wires):
+        return [{'id': str(int(time.time() * 1000)), 'type': kind,
+                 'topic': "/market/ticker:" + ",".join(chunk), 'response': True}
+                for chunk in _chunks(wires, self.batch)]
+
+    def subscribe(self, wires):
+        return self._msg('subscribe', wires)
+
+    def unsubscribe(self, wires):
+        return self._msg('unsubscribe', wires)
+
+    def ping(self):
+        return {'id': str(int(time.time() * 1000)), 'type': 'ping'}
+
+    def parse(self, msg):
+        if isinstance(msg, dict) and msg.get('type') == 'message' \
+                and str(msg.get('topic', '')).startswith('/market/ticker:'):
+            return [(msg['topic'].split(':', 1)[1], float(msg['data']['price']))]
+        return []
+
+
+class GateIO(Protocol):
+    name = 'gateio'
+    url = "wss://api.gateio.ws/ws/v4/"
+    ping_interval = 20
+    batch = 100
+
+    def _msg(self, event, wires):
+        return [{'time': int(time.time()), 'channel': 'spot.tickers', 'event': event, 'payload': chunk}
+                for chunk in _chunks(wires, self.batch)]
+
+    def subscribe(self, wires):
+        return self._msg('subscribe', wires)
+
+    def unsubscribe(self, wires):
+        return self._msg('unsubscribe', wires)
+
+    def ping(self):
+        return {'time': int(time.time()), 'channel': 'spot.ping'}
+
+    def parse(self, msg):
+        if isinstance(msg, dict) and msg.get('channel') == 'spot.tickers' and msg.get('event') == 'update':
+            result = msg['result']
+            return [(result['currency_pair'], float(result['last']))]
+        return []
+
+
+class BitMart(Protocol):
+    name = 'bitmart'
+    url = "wss://ws-manager-compress.bitmart.com/api?protocol=1.1"
+    ping_interval = 15
+
+    def subscribe(self, wires):
+        return [{'op': 'subscribe', 'args': [f"spot/ticker:{w}" for w in chunk]}
+                for chunk in _chunks(wires, self.batch)]
+
+    def unsubscribe(self, wires):
+        return [{'op': 'unsubscribe', 'args': [f"spot/ticker:{w}" for w in chunk]}
+                for chunk in _chunks(wires, self.batch)]
+
+    def ping(self):
+        return 'ping'
+
+    def parse(self, msg):
+        if isinstance(msg, dict) and msg.get('table') == 'spot/ticker':
+            return [(t['symbol'], float(t['last_price'])) for t in msg['data']]
+        return []
+
+
+PROTOCOLS = {p.name: p for p in (Binance(), Bybit(), HTX(), KuCoin(), GateIO(), BitMart())}
+
+
+def _decode(msg):
+    data = msg.data
+    if msg.type == aiohttp.WSMsgType.BINARY:
+        # HTX sends gzip, BitMart raw deflate
+        try:
+            data = zlib.decompress(data, 47)
+        except zlib.error:
+            data = zlib.decompress(data, -zlib.MAX_WBITS)
+        data = data.decode()
+    try:
+        return json.loads(data)
+    except ValueError:
+        return data
+
+
+async def _send(ws, payload):
+    if isinstance(payload, str):
+        await ws.send_str(payload)
+    else:
+        await ws.send_json(payload)
+
+
+class PriceStreams:
+    """Streams ticker updates for every (exchange, symbol) that has an active alert.
+
+    `on_price(exchange, symbol, price)` is called for each update with the
+    canonical symbol. An exchange's symbols are spread over as many sockets
+    as its per-connection stream limit needs. `covers(pair)` says whether a
+    pair is really being streamed -- its socket is up and it had an update in
+    the last STREAM_STALE seconds -- so a subscription the exchange refused or
+    ignored is polled over REST like any pair whose socket is down. `live`
+    is the set of exchanges with at least one socket up. `wire(exchange,
+    symbol)` spells subscriptions the exchange's way (e.g. SymbolCatalog.wire).
+    """
+
+    def __init__(self, sessions, on_price, wire=wire_symbol):
+        self.sessions = sessions
+        self.on_price = on_price
+        self.wire = wire
+        self.seen = {}  # (exchange, symbol) -> monotonic time of its last streamed price
+        self._conn = {}  # (exchange, symbol) -> number of the connection carrying it
+        self._up = set()  # (exchange, n) connections that are open and subscribed
+        self._wanted = {}  # (exchange, n) -> symbols
+        self._subscribed = {}
+        self._sockets = {}
+        self._tasks = {}
+        self._locks = defaultdict(asyncio.Lock)  # (exchange, n) -> serializes its subscribe/unsubscribe diffs
+
+    @property
+    def live(self):
+        return {exchange for exchange, _ in self._up}
+
+    def covers(self, pair, now=None):
+        """True while `pair` gets its prices from a socket, False if it needs REST polling"""
+        conn = self._conn.get(pair)
+        if conn is None or (pair[0], conn) not in self._up:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - self.seen.get(pair, -math.inf) < STREAM_STALE
+
+    def _assign(self, wanted):
+        """Keep each symbol on its connection; new ones go to the first with room"""
+        for pair in list(self._conn):
+            if pair[1] not in wanted.get(pair[0], ()):
+                del self._conn[pair]
+                self.seen.pop(pair, None)
+        load = defaultdict(int)
+        for (exchange, _), n in self._conn.items():
+            load[(exchange, n)] += 1
+        for exchange, symbols in wanted.items():
+            limit, n = PROTOCOLS[exchange].max_streams, 0
+            for symbol in sorted(symbols):
+                if (exchange, symbol) in self._conn:
+                    continue
+                while load[(exchange, n)] >= limit:
+                    n += 1
+                self._conn[(exchange, symbol)] = n
+                load[(exchange, n)] += 1
+        conns = defaultdict(set)
+        for (exchange, symbol), n in self._conn.items():
+            conns[(exchange, n)].add(symbol)
+        return dict(conns)
+
+    async def sync(self, pairs):
+        """Subscribe/unsubscribe so the open sockets match `pairs` exactly"""
+        wanted = defaultdict(set)
+        for exchange, symbol in pairs:
+            if exchange in PROTOCOLS:
+                wanted[exchange].add(canonical_symbol(symbol))
+        old = self._wanted
+        self._wanted = self._assign(wanted)
+        for conn in set(old) | set(self._wanted):
+            # One diff at a time per connection, always against the latest wanted set
+            async with self._locks[conn]:
+                await self._apply(conn)
+
+    async def _apply(self, conn):
+        symbols = self._wanted.get(conn, set())
+        ws = self._sockets.get(conn)
+        if not symbols:
+            if ws is not None:
+                await ws.close()
+            return
+        if conn not in self._tasks:
+            self._tasks[conn] = asyncio.create_task(self._run(conn))
+            return
+        if ws is None or ws.closed:
+            return  # the reconnect subscribes to the current set
+        subscribed = self._subscribed[conn]
+        added, removed = symbols - subscribed, subscribed - symbols
+        self._subscribed[conn] = set(symbols)
+        exchange = conn[0]
+        proto = PROTOCOLS[exchange]
+        for payload in proto.subscribe([self.wire(exchange, s) for s in added]) + \
+                proto.unsubscribe([self.wire(exchange, s) for s in removed]):
+            await _send(ws, payload)
+
+    async def close(self):
+        self._wanted = {}
+        for task in list(self._tasks.values()):
+            task.cancel()
+        self._tasks.clear()
+
+    async def _ping(self, ws, proto):
+        while not ws.closed:
+            await asyncio.sleep(proto.ping_interval)
+            await _send(ws, proto.ping())
+
+    async def _run(self, conn):
+        exchange = conn[0]
+        proto = PROTOCOLS[exchange]
+        seen = self.seen
+        backoff = WS_BACKOFF_MIN
+        try:
+            while self._wanted.get(conn):
+                try:
+                    session = self.sessions.get_ws(exchange)
+                    url = await proto.connect_url(session)
+                    async with session.ws_connect(url, heartbeat=30) as ws:
+                        async with self._locks[conn]:
+                            symbols = set(self._wanted.get(conn, ()))
+                            if not symbols:
+                                break  # every alert went away while we were connecting
+                            self._sockets[conn] = ws
+                            self._subscribed[conn] = symbols
+                            for payload in proto.subscribe([self.wire(exchange, s) for s in symbols]):
+                                await _send(ws, payload)
+                        self._up.add(conn)
+                        backoff = WS_BACKOFF_MIN
+                        logging.info(f"{exchange} stream {conn[1]} up ({len(symbols)} symbols)")
+                        pinger = asyncio.create_task(self._ping(ws, proto)) if proto.ping_interval else None
+                        try:
+                            async for msg in ws:
+                                if msg.type not in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                                    break
+                                payload = _decode(msg)
+                                answer = proto.reply(payload)
+                                if answer is not None:
+                                    await _send(ws, answer)
+                                for wire, price in proto.parse(payload):
+                                    symbol = canonical_symbol(wire)
+                                    seen[(exchange, symbol)] = time.monotonic()
+                                    self.on_price(exchange, symbol, price)
+                        finally:
+                            if pinger:
+                                pinger.cancel()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logging.warning(f"{exchange} stream {conn[1]} error: {e!r}")
+                finally:
+                    self._up.discard(conn)
+                    self._sockets.pop(conn, None)
+                    self._subscribed.pop(conn, None)
+                if not self._wanted.get(conn):
+                    break
+                # Dropped: REST polling covers these pairs until we are back
+                await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+                backoff = min(backoff * 2, WS_BACKOFF_MAX)
+        finally:
+            self._tasks.pop(conn, None)
@@ -0,0 +1,74 @@
+import math
+
+from alert_index import ThresholdIndex
+
+PAIR = ('binance', 'BTCUSDT')
+
+
+def index(*alerts):
+    idx = ThresholdIndex()
+    for alert_id, direction, limit in alerts:
+        idx.add(PAIR, 1, alert_id, direction, limit)
+    return idx
+
+
+def test_crossed_includes_limits_equal_to_the_price():
+    idx = index(('up', 'above', 100.0), ('down', 'below', 90.0))
+    assert idx.crossed(PAIR, 99.9) == []
+    assert idx.crossed(PAIR, 100.0) == [(1, 'up')]
+    assert idx.crossed(PAIR, 90.0) == [(1, 'down')]
+    assert idx.crossed(('binance', 'ETHUSDT'), 100.0) == []
+
+
+def test_same_limit_ties_are_all_returned_and_removed_individually():
+    idx = index(('a', 'above', 100.0), ('b', 'above', 100.0), ('c', 'above', 100.0))
+    assert sorted(idx.crossed(PAIR, 100.0)) == [(1, 'a'), (1, 'b'), (1, 'c')]
+    assert idx.discard(1, 'b')
+    assert sorted(idx.crossed(PAIR, 100.0)) == [(1, 'a'), (1, 'c')]
+    assert not idx.discard(1, 'b')
+
+
+def test_readding_an_alert_moves_it_and_flips_its_direction():
+    idx = index(('a', 'above', 100.0))
+    idx.add(PAIR, 1, 'a', 'below', 99.8)  # fired: now watched at its re-arm level
+    assert len(idx) == 1
+    assert idx.crossed(PAIR, 100.0) == []
+    assert idx.crossed(PAIR, 99.8) == [(1, 'a')]
+    idx.add(PAIR, 1, 'a', 'above', 100.0)  # re-armed
+    assert idx.crossed(PAIR, 99.8) == []
+    assert idx.crossed(PAIR, 100.0) == [(1, 'a')]
+
+
+def test_discarding_the_last_alert_drops_the_pair():
+    idx = index(('a', 'above', 100.0))
+    assert list(idx.pairs()) == [PAIR]
+    idx.discard(1, 'a')
+    assert not idx.pairs() and not len(idx) and (1, 'a') not in idx
+
+
+def test_add_many_matches_one_by_one_adds():
+    rows = [(PAIR, 1, f"a{i}", 'above' if i % 2 else 'below', float(i % 7)) for i in range(40)]
+    bulk, single = ThresholdIndex(), ThresholdIndex()
+    bulk.add_many(rows)
+    for row in rows:
+        single.add(*row)
+    for price in (-1.0, 0.0, 3.0, 3.5, 6.0, 7.0):
+        assert sorted(bulk.crossed(PAIR, price)) == sorted(single.crossed(PAIR, price))
+
+
+def test_band_is_the_open_interval_between_the_nearest_limits():
+    idx = index(('up', 'above', 105.0), ('up2', 'above', 110.0), ('down', 'below', 95.0))
+    assert idx.band(PAIR, 100.0) == (95.0, 105.0)
+    assert idx.band(PAIR, 105.0) is None  # touching a limit crosses it
+    assert idx.band(PAIR, 95.0) is None
+    assert idx.band(('binance', 'ETHUSDT'), 1.0) == (-math.inf, math.inf)
+    assert index(('up', 'above', 105.0)).band(PAIR, 100.0) == (-math.inf, 105.0)
+
+
+def test_nearest_skips_limits_already_crossed():
+    idx = index(('up', 'above', 105.0), ('down', 'below', 97.0))
+    assert idx.nearest(PAIR, 100.0) == 3.0
+    assert idx.nearest(PAIR, 106.0) == 9.0  # 105 is crossed, 97 is 9 below
+    assert idx.nearest(PAIR, 96.0) == 9.0  # 97 is crossed, 105 is 9 above
+    assert index(('up', 'above', 105.0)).nearest(PAIR, 105.0) is None  # the only limit is crossed
+    assert idx.nearest(('binance', 'ETHUSDT'), 1.0) is None
@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from alert_index import ThresholdIndex
+from columnar_store import ColumnarAlertStore
+
+PAIRS = [('binance', 'BTCUSDT'), ('kucoin', 'ETHUSDT'), ('htx', 'SOLUSDT')]
+
+
+def test_matches_threshold_index_under_random_changes():
+    rnd = random.Random(7)
+    index, store = ThresholdIndex(), ColumnarAlertStore()
+    rows = [(rnd.choice(PAIRS), rnd.randrange(20), f"a{i}", rnd.choice(['above', 'below']),
+             float(rnd.randrange(90, 111))) for i in range(300)]
+    index.add_many(rows)
+    store.add_many(rows)
+    for step in range(2000):
+        op = rnd.random()
+        if op < 0.3:
+            row = (rnd.choice(PAIRS), rnd.randrange(20), f"a{rnd.randrange(400)}",
+                   rnd.choice(['above', 'below']), float(rnd.randrange(90, 111)))
+            index.add(*row)
+            store.add(*row)
+        elif op < 0.5:
+            key = (rnd.randrange(20), f"a{rnd.randrange(400)}")
+            assert index.discard(*key) == store.discard(*key)
+        pair, price = rnd.choice(PAIRS), rnd.uniform(85, 115)
+        assert sorted(store.crossed(pair, price)) == sorted(index.crossed(pair, price))
+        assert store.nearest(pair, price) == index.nearest(pair, price)
+        assert store.band(pair, price) == index.band(pair, price)
+    assert len(store) == len(index)
+    assert set(store.pairs()) == set(index.pairs())
+
+
+def test_evaluate_checks_every_priced_pair():
+    store = ColumnarAlertStore()
+    store.add(PAIRS[0], 1, 'up', 'above', 100.0)
+    store.add(PAIRS[1], 2, 'down', 'below', 50.0)
+    assert sorted(store.evaluate({PAIRS[0]: 101.0, PAIRS[1]: 49.0, PAIRS[2]: 1.0})) == [(1, 'up'), (2, 'down')]
+    assert store.evaluate({PAIRS[0]: None}) == []
+
+
+def test_last_alert_removed_drops_the_pair():
+    store = ColumnarAlertStore()
+    store.add(PAIRS[0], 1, 'a', 'above', 100.0)
+    assert store.discard(1, 'a')
+    assert not store.discard(1, 'a')
+    assert list(store.pairs()) == []
+    assert store.crossed(PAIRS[0], 200.0) == []
+
+
+def test_muted_alerts_keep_their_slot_but_never_cross():
+    store = ColumnarAlertStore()
+    store.add(PAIRS[0], 1, 'a', 'above', 100.0)
+    store.add(PAIRS[0], 2, 'b', 'above', 100.0)
+    assert store.set_muted(1, 'a', True)
+    assert store.crossed(PAIRS[0], 101.0) == [(2, 'b')]
+    assert store.set_muted(1, 'a', False)
+    assert sorted(store.crossed(PAIRS[0], 101.0)) == [(1, 'a'), (2, 'b')]
+    assert not store.set_muted(3, 'c', True)
+
+
+def test_deleted_slots_are_reused():
+    store = ColumnarAlertStore()
+    for i in range(10):
+        store.add(PAIRS[i % 3], i, f"a{i}", 'above', 50.0 + i)
+    for i in range(5):
+        store.discard(i, f"a{i}")
+    used = store.used
+    for i in range(5):
+        store.add(PAIRS[0], 100 + i, f"b{i}", 'above', 1.0)
+    assert store.used == used == 10
+    assert len(store) == 10
+    assert sorted(store.crossed(PAIRS[0], 1.0)) == [(100 + i, f"b{i}") for i in range(5)]
@@ -0,0 +1,32 @@
+from fetcher import EXCHANGE_LIMITS, share_limits
+
+
+def test_shared_budgets_add_up_to_the_exchange_budget():
+    shares = 3
+    shared = share_limits(EXCHANGE_LIMITS, shares)
+    for exchange, cfg in EXCHANGE_LIMITS.items():
+        part = shared[exchange]
+        assert part['rate'] * shares <= cfg['rate'] + 1e-9
+        assert part['concurrency'] >= 1
+        # Every share can still afford its most expensive call
+        assert part['burst'] >= max(cfg['single'], cfg['bulk'])
+        if cfg['burst'] / shares >= max(cfg['single'], cfg['bulk']):
+            assert part['burst'] * shares <= cfg['burst'] + 1e-9
+
+
+# Published per-IP limits: (weight, window in seconds)
+PUBLISHED = {
+    'binance': (6000, 60),
+    'bybit': (600, 5),
+    'htx': (100, 10),
+    'kucoin': (2000, 30),
+    'gateio': (200, 10),
+    'bitmart': (10, 2),
+}
+
+
+def test_budgets_fit_inside_every_published_window():
+    for exchange, (limit, window) in PUBLISHED.items():
+        cfg = EXCHANGE_LIMITS[exchange]
+        # Worst case: a full bucket spent at once, then the refill for the rest of the window
+        assert cfg['burst'] + window * cfg['rate'] <= limit, exchange
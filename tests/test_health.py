@@ -0,0 +1,74 @@
+import asyncio
+
+from fetcher import FetchScheduler
+from health import BREAKER_BACKOFF_MIN, BREAKER_FAILURES, CLOSED, HALF_OPEN, OPEN, ExchangeHealth
+
+
+def trip(health, now=0.0):
+    for _ in range(BREAKER_FAILURES):
+        health.record(False, 0.0, now)
+
+
+def test_consecutive_failures_open_the_breaker():
+    health = ExchangeHealth()
+    for _ in range(BREAKER_FAILURES - 1):
+        health.record(False, 0.0, 0.0)
+    assert health.state == CLOSED
+    health.record(False, 0.0, 0.0)
+    assert health.state == OPEN
+    assert not health.allow(BREAKER_BACKOFF_MIN - 0.1)
+
+
+def test_half_open_probe_closes_on_success():
+    health = ExchangeHealth()
+    trip(health)
+    assert health.allow(BREAKER_BACKOFF_MIN)
+    assert health.state == HALF_OPEN
+    assert not health.allow(BREAKER_BACKOFF_MIN)  # only one probe
+    health.record(True, 0.1, BREAKER_BACKOFF_MIN)
+    assert health.state == CLOSED
+    assert health.backoff == BREAKER_BACKOFF_MIN
+
+
+def test_failed_probe_doubles_the_backoff():
+    health = ExchangeHealth()
+    trip(health)
+    assert health.allow(BREAKER_BACKOFF_MIN)
+    health.record(False, 0.0, BREAKER_BACKOFF_MIN)
+    assert health.state == OPEN
+    assert health.backoff == BREAKER_BACKOFF_MIN * 2
+    assert health.open_until == BREAKER_BACKOFF_MIN * 3
+
+
+def test_cancelled_probe_does_not_leave_the_breaker_half_open():
+    async def hang():
+        await asyncio.sleep(3600)
+
+    async def main():
+        fetcher = FetchScheduler()
+        health = fetcher._health('binance')
+        trip(health, now=-BREAKER_BACKOFF_MIN)
+        probe = asyncio.ensure_future(fetcher.run('binance', 'single', hang))
+        await asyncio.sleep(0.01)
+        assert health.state == HALF_OPEN
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        return health
+
+    assert asyncio.run(main()).state == OPEN
+
+
+def test_latency_excludes_time_queued_for_budget():
+    async def quick():
+        await asyncio.sleep(0.01)
+        return 1
+
+    async def main():
+        # One token a second: the second call waits ~1s for budget, but answers in ~10ms
+        limits = {'x': {'concurrency': 1, 'rate': 1, 'burst': 1, 'single': 1, 'bulk': 1}}
+        fetcher = FetchScheduler(limits)
+        assert await fetcher.gather([('x', 'single', quick), ('x', 'single', quick)]) == [1, 1]
+        return fetcher.health['x']
+
+    health = asyncio.run(main())
+    assert max(health._latencies) < 0.5
@@ -0,0 +1,72 @@
+import asyncio
+
+from notifier import Notifier
+
+
+def run(scenario):
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+
+
+def test_retrigger_during_send_is_delivered():
+    async def scenario():
+        sent = []
+
+        async def send(user_id, batch):
+            sent.append([(alert_id, price) for alert_id, _, price in batch])
+            if len(sent) == 1:
+                notifier.submit(user_id, 'a', {}, 2.0)  # fires again while the first message is in flight
+                await asyncio.sleep(0)
+
+        notifier = Notifier(send, workers=1, rate=1000, chat_interval=0.01)
+        await notifier.start()
+        notifier.submit(1, 'a', {}, 1.0)
+        notifier.submit(1, 'b', {}, 1.0)
+        while len(sent) < 2:
+            await asyncio.sleep(0.01)
+        await notifier.close()
+        assert sent == [[('a', 1.0), ('b', 1.0)], [('a', 2.0)]]
+
+    run(scenario)
+
+
+def test_paced_chats_are_forgotten_once_idle():
+    async def scenario():
+        sent = []
+
+        async def send(user_id, batch):
+            sent.append(user_id)
+
+        notifier = Notifier(send, workers=2, rate=1000, chat_interval=0.02)
+        await notifier.start()
+        for user_id in range(5):
+            notifier.submit(user_id, 'a', {}, 1.0)
+        while len(sent) < 5:
+            await asyncio.sleep(0.01)
+        assert notifier._next_send
+        await asyncio.sleep(0.05)
+        assert notifier._next_send == {}
+        await notifier.close()
+
+    run(scenario)
+
+
+def test_chat_stays_paced_while_messages_wait():
+    async def scenario():
+        times = []
+        loop = asyncio.get_running_loop()
+
+        async def send(user_id, batch):
+            times.append(loop.time())
+
+        notifier = Notifier(send, workers=1, rate=1000, chat_interval=0.05)
+        await notifier.start()
+        notifier.submit(1, 'a', {}, 1.0)
+        while not times:
+            await asyncio.sleep(0.005)
+        notifier.submit(1, 'b', {}, 1.0)
+        while len(times) < 2:
+            await asyncio.sleep(0.005)
+        await notifier.close()
+        assert times[1] - times[0] >= 0.045
+
+    run(scenario)
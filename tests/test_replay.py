@@ -0,0 +1,57 @@
+import os
+import sqlite3
+
+import pytest
+
+from notifier import MAX_BATCH
+from replay import Backtest, load_rows
+from storage import AlertStore
+
+PAIR = ('binance', 'BTCUSDT')
+
+
+def rows(n, user_id=1, limit=100.0):
+    return [(user_id, f"a{i}", {'exchange': PAIR[0], 'symbol': PAIR[1], 'limit': limit + i / 1000,
+                                'direction': 'above', 'cooldown': 0}) for i in range(n)]
+
+
+def test_alerts_firing_on_one_tick_make_one_message():
+    backtest = Backtest(rows(3), chat_interval=1.0)
+    backtest.run([(10.0, PAIR, 200.0)])
+    assert len(backtest.fires) == 3
+    assert backtest.messages == 1
+
+
+def test_fires_while_the_chat_is_paced_join_the_next_message():
+    alerts = [(1, alert_id, {'exchange': PAIR[0], 'symbol': PAIR[1], 'limit': limit,
+                             'direction': 'above', 'cooldown': 0})
+              for alert_id, limit in (('a', 100.0), ('b', 300.0), ('c', 400.0))]
+    backtest = Backtest(alerts, chat_interval=1.0)
+    backtest.run([(10.0, PAIR, 200.0),   # a: sent at 10
+                  (10.5, PAIR, 350.0),   # b: waits until 11
+                  (10.7, PAIR, 450.0)])  # c: joins b's message
+    assert backtest.messages == 2
+
+
+def test_a_full_batch_spills_into_another_message():
+    backtest = Backtest(rows(MAX_BATCH + 1), chat_interval=1.0)
+    backtest.run([(10.0, PAIR, 200.0)])
+    assert backtest.messages == 2
+
+
+def test_load_rows_leaves_the_database_alone(tmp_path):
+    path = str(tmp_path / 'alerts.db')
+    store = AlertStore(path, flush_interval=0.01)
+    store.save(1, 'a', {'exchange': 'binance', 'symbol': 'BTCUSDT', 'limit': 1.0, 'direction': 'above',
+                        'state': 'fired', 'fired_at': 5.0})
+    store.close()
+    before = os.stat(path).st_mtime_ns
+    (user_id, alert_id, alert), = load_rows(path, cooldown=60)
+    assert (user_id, alert_id) == (1, 'a')
+    assert alert['state'] == 'armed' and alert['cooldown'] == 60
+    assert os.stat(path).st_mtime_ns == before
+
+    missing = tmp_path / 'typo.db'
+    with pytest.raises(sqlite3.Error):
+        load_rows(str(missing))
+    assert not missing.exists()
@@ -0,0 +1,54 @@
+from scheduler import DEFAULT_VOL, POLL_SIGMAS, PollScheduler
+
+PAIR = ('binance', 'BTCUSDT')
+
+
+def scheduler(gap, poll_min=1.0, poll_max=60.0):
+    return PollScheduler(lambda pair, price: gap, poll_min, poll_max)
+
+
+def test_interval_follows_the_gap_to_the_nearest_limit():
+    price = 100.0
+    # A gap that a POLL_SIGMAS move covers in 10s at the default volatility
+    gap = price * POLL_SIGMAS * DEFAULT_VOL * 10 ** 0.5
+    assert abs(scheduler(gap).interval(PAIR, price) - 10.0) < 1e-9
+    assert scheduler(gap / 100).interval(PAIR, price) == 1.0  # clamped to poll_min
+    assert scheduler(gap * 100).interval(PAIR, price) == 60.0  # and to poll_max
+    assert scheduler(None).interval(PAIR, price) == 60.0  # nothing left to cross
+
+
+def test_volatile_pairs_are_polled_sooner():
+    s = scheduler(1.0)
+    calm = s.interval(PAIR, 100.0)
+    for t, price in enumerate((100.0, 102.0, 99.0, 103.0)):
+        s.observe(PAIR, price, now=float(t))
+    assert s.volatility(PAIR) > DEFAULT_VOL
+    assert s.interval(PAIR, 100.0) < calm
+
+
+def test_observe_schedules_and_pop_due_hands_out_each_pair_once():
+    s = scheduler(None, poll_max=30.0)
+    s.observe(PAIR, 100.0, now=0.0)
+    assert s.next_due() == 30.0
+    assert s.pop_due(29.9) == []
+    assert s.pop_due(30.0) == [PAIR]
+    assert s.pop_due(31.0) == [] and s.next_due() is None
+
+
+def test_touch_only_brings_a_poll_forward():
+    s = scheduler(None, poll_max=30.0)
+    s.observe(PAIR, 100.0, now=0.0)
+    s.touch(PAIR, 5.0)
+    assert s.next_due() == 5.0
+    s.touch(PAIR, 20.0)  # later than already due: ignored
+    assert s.next_due() == 5.0
+    assert s.pop_due(5.0) == [PAIR]
+    assert s.pop_due(30.0) == []  # the superseded entry is stale
+
+
+def test_forgotten_pairs_are_never_due():
+    s = scheduler(None)
+    s.touch(PAIR, 0.0)
+    s.forget(PAIR)
+    assert s.next_due() is None
+    assert s.pop_due(100.0) == []
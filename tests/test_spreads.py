@@ -0,0 +1,66 @@
+from engine import AlertEngine
+from spreads import SpreadBook, spread_pct
+from triggers import FIRED
+
+
+def spread_alert(limit=1.0, direction='above', **extra):
+    return {'exchange': 'binance', 'exchange_b': 'kucoin', 'symbol': 'BTC-USDT',
+            'limit': limit, 'direction': direction, **extra}
+
+
+def test_spread_pct_is_symmetric_and_relative_to_the_lower_price():
+    assert spread_pct(100.0, 101.0) == spread_pct(101.0, 100.0) == 1.0
+
+
+def test_only_rows_with_alerts_are_kept_and_checked_when_changed():
+    book = SpreadBook()
+    book.add(1, 'a', spread_alert())
+    assert set(book.pairs()) == {('binance', 'BTCUSDT'), ('kucoin', 'BTCUSDT')}
+    book.observe('binance', 'ETHUSDT', 1.0)
+    assert 'ETHUSDT' not in book.matrix
+    book.observe('binance', 'BTCUSDT', 100.0)
+    assert book.crossed() == []  # the other leg is unknown yet
+    book.observe('kucoin', 'BTCUSDT', 101.0)
+    assert book.crossed() == [(1, 'a', 1.0)]
+    assert book.crossed() == []  # nothing changed since
+    book.observe('kucoin', 'BTCUSDT', 101.0)
+    assert not book.changed  # the same price is no change
+
+
+def test_refiling_keeps_the_row_and_discarding_the_last_alert_drops_it():
+    book = SpreadBook()
+    book.add(1, 'a', spread_alert())
+    book.observe('binance', 'BTCUSDT', 100.0)
+    book.observe('kucoin', 'BTCUSDT', 100.5)
+    book.crossed()
+    book.add(1, 'a', spread_alert(limit=0.5))
+    assert book.matrix['BTCUSDT'] == {'binance': 100.0, 'kucoin': 100.5}
+    assert book.crossed() == [(1, 'a', 0.5)]
+    book.discard(1, 'a')
+    assert not book.matrix and not book.pairs() and not len(book)
+
+
+def test_nearest_is_half_the_room_left_as_a_price_gap():
+    book = SpreadBook()
+    book.add(1, 'a', spread_alert(limit=2.0))
+    assert book.nearest(('binance', 'BTCUSDT'), 100.0) == 0  # other leg unknown: poll now
+    book.observe('kucoin', 'BTCUSDT', 100.0)
+    assert abs(book.nearest(('binance', 'BTCUSDT'), 100.0) - 1.0) < 1e-9
+    assert book.nearest(('bybit', 'BTCUSDT'), 100.0) is None
+
+
+def test_engine_fires_rearms_and_refires_a_spread_alert():
+    fired, states = [], []
+    engine = AlertEngine(lambda *hit: fired.append(hit[3]), lambda *change: states.append(change[2]['state']))
+    alert = spread_alert(limit=1.0, hysteresis=0.2, cooldown=0)
+    engine.add_many([(1, 'a', alert)])
+    engine.on_price('binance', 'BTCUSDT', 100.0, now=1.0)
+    engine.on_price('kucoin', 'BTCUSDT', 101.0, now=1.0)
+    assert fired == [1.0] and alert['state'] == FIRED
+    # Still above the re-arm level (1.0 - 0.2 points): stays fired and quiet
+    engine.on_price('kucoin', 'BTCUSDT', 100.85, now=2.0)
+    assert len(fired) == 1 and alert['state'] == FIRED
+    engine.on_price('kucoin', 'BTCUSDT', 100.7, now=3.0)
+    assert states == ['fired', 'armed']
+    engine.on_price('kucoin', 'BTCUSDT', 101.2, now=4.0)
+    assert len(fired) == 2
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+import storage
+from storage import AlertStore, connect, migrate
+
+OLD_SCHEMA = "CREATE TABLE alerts (user_id INTEGER, alert_id TEXT, data TEXT, muted INTEGER DEFAULT 0, PRIMARY KEY (user_id, alert_id))"
+
+
+def make_legacy(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(OLD_SCHEMA)
+    conn.executemany("INSERT INTO alerts VALUES (?, ?, ?, ?)",
+                     [(uid, aid, json.dumps(alert), muted) for uid, aid, alert, muted in rows])
+    conn.commit()
+    conn.close()
+
+
+def load(path):
+    store = AlertStore(path)
+    try:
+        return {(uid, aid): alert for chunk in store.load() for uid, aid, alert in chunk}
+    finally:
+        store.close()
+
+
+def tables(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    finally:
+        conn.close()
+
+
+def test_json_rows_become_columns(tmp_path):
+    path = str(tmp_path / 'alerts.db')
+    make_legacy(path, [
+        (1, 'a', {'exchange': 'kucoin', 'symbol': 'ETHUSDT', 'limit': 3000.0, 'direction': 'below'}, 1),
+        # Saved by bot_working.py: no exchange
+        (2, 'b', {'symbol': 'BTCUSDT', 'limit': 90000.0, 'direction': 'above'}, 0),
+        (3, 'c', {'symbol': 'BTCUSDT'}, 0),  # unreadable: left out
+    ])
+    alerts = load(path)
+    assert alerts[(1, 'a')] == {'exchange': 'kucoin', 'symbol': 'ETHUSDT', 'limit': 3000.0,
+                                'direction': 'below', 'muted': True, 'state': 'armed'}
+    assert alerts[(2, 'b')]['exchange'] == storage.LEGACY_EXCHANGE
+    assert (3, 'c') not in alerts
+    assert 'alerts_json' not in tables(path)
+
+
+def test_failed_conversion_leaves_the_old_table(tmp_path, monkeypatch):
+    path = str(tmp_path / 'alerts.db')
+    make_legacy(path, [(1, 'a', {'exchange': 'htx', 'symbol': 'BTCUSDT', 'limit': 1.0, 'direction': 'above'}, 0)])
+
+    def crash(conn):
+        raise RuntimeError("killed")
+
+    monkeypatch.setattr(storage, '_legacy_rows', crash)
+    conn = connect(path)
+    with pytest.raises(RuntimeError):
+        migrate(conn)
+    conn.close()
+    assert tables(path) == {'alerts'}
+    monkeypatch.undo()
+    assert list(load(path)) == [(1, 'a')]
+
+
+def test_leftover_alerts_json_is_picked_up(tmp_path):
+    path = str(tmp_path / 'alerts.db')
+    make_legacy(path, [(1, 'a', {'exchange': 'htx', 'symbol': 'BTCUSDT', 'limit': 1.0, 'direction': 'above'}, 0)])
+    # What the old, non-atomic migration left after a crash: renamed table, empty new one
+    conn = sqlite3.connect(path)
+    conn.execute("ALTER TABLE alerts RENAME TO alerts_json")
+    conn.execute("CREATE TABLE alerts (user_id INTEGER NOT NULL, alert_id TEXT NOT NULL, exchange TEXT NOT NULL, "
+                 "symbol TEXT NOT NULL, direction TEXT NOT NULL, limit_price REAL NOT NULL, "
+                 "muted INTEGER NOT NULL DEFAULT 0, state TEXT NOT NULL DEFAULT 'armed', fired_at REAL, "
+                 "hysteresis REAL, cooldown REAL, PRIMARY KEY (user_id, alert_id))")
+    conn.commit()
+    conn.close()
+    assert list(load(path)) == [(1, 'a')]
+    assert 'alerts_json' not in tables(path)
+
+
+def test_save_delete_and_spread_column_round_trip(tmp_path):
+    path = str(tmp_path / 'alerts.db')
+    store = AlertStore(path, flush_interval=0.01)
+    spread = {'exchange': 'binance', 'exchange_b': 'kucoin', 'symbol': 'BTCUSDT', 'limit': 0.3,
+              'direction': 'above', 'muted': False, 'state': 'fired', 'fired_at': 5.0, 'cooldown': 60.0}
+    store.save(1, 's', spread)
+    store.save(1, 'gone', {'exchange': 'htx', 'symbol': 'ETHUSDT', 'limit': 1.0, 'direction': 'above'})
+    store.delete(1, 'gone')
+    store.close()
+    assert load(path) == {(1, 's'): spread}
+
+
+def test_bot_working_runs_on_a_file_bot_py_migrated(tmp_path, monkeypatch):
+    monkeypatch.setenv('TELEGRAM_BOT_TOKEN', '123456:' + 'A' * 35)
+    bot_working = pytest.importorskip('bot_working')
+    path = str(tmp_path / 'alerts.db')
+    make_legacy(path, [(1, 'old', {'symbol': 'BTCUSDT', 'limit': 90000.0, 'direction': 'above'}, 0)])
+    load(path)  # bot.py starts first and converts the file
+    store = AlertStore(path, flush_interval=0.01)
+    store.save(1, 'spread', {'exchange': 'binance', 'exchange_b': 'kucoin', 'symbol': 'BTCUSDT',
+                             'limit': 0.3, 'direction': 'above'})
+    store.close()
+
+    monkeypatch.setattr(bot_working, 'alerts', bot_working.defaultdict(dict))
+    monkeypatch.setattr(bot_working, 'store', AlertStore(path, flush_interval=0.01))
+    asyncio.run(bot_working.load_alerts())
+    assert list(bot_working.alerts[1]) == ['old']  # spread alerts are left to bot.py
+    new = {'exchange': storage.LEGACY_EXCHANGE, 'symbol': 'ETHUSDT', 'limit': 3000.0, 'direction': 'below'}
+    asyncio.run(bot_working.save_alert(1, 'new', new))
+    bot_working.store.delete(1, 'old')
+    bot_working.store.close()
+    assert set(load(path)) == {(1, 'spread'), (1, 'new')}
@@ -0,0 +1,178 @@
+import asyncio
+import socket
+import time
+from types import SimpleNamespace
+
+from aiohttp import web
+
+import streams
+from bench.ws_standin import make_app, parse_request
+from sessions import SessionManager
+from streams import PriceStreams
+
+CFG = SimpleNamespace(interval=0.01, volatility=0.001, start_price=100.0, drop_after=0)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def serve(port):
+    runner = web.AppRunner(make_app(CFG), shutdown_timeout=0.1)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    return runner
+
+
+async def until(check, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not check():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def run(monkeypatch, scenario, exchange='gateio'):
+    port = free_port()
+    monkeypatch.setenv(f"WS_URL_{exchange.upper()}", f"ws://127.0.0.1:{port}/ws/{exchange}")
+    monkeypatch.setattr(streams, 'WS_BACKOFF_MIN', 0.05)
+    monkeypatch.setattr(streams, 'WS_BACKOFF_MAX', 0.05)
+    sent = []
+    send = streams._send
+
+    async def recording_send(ws, payload):
+        sent.append(payload)
+        await asyncio.sleep(0)  # a real send can wait on the socket's buffer
+        await send(ws, payload)
+
+    monkeypatch.setattr(streams, '_send', recording_send)
+
+    async def main():
+        runner = await serve(port)
+        sessions = SessionManager()
+        prices = []
+        try:
+            await scenario(port, runner, sessions, prices, sent)
+        finally:
+            await sessions.close()
+            await runner.cleanup()
+
+    asyncio.run(main())
+
+
+def test_parse_request_ignores_unknown_text_frames():
+    assert parse_request('binance', 'hello') == (None, [])
+    assert parse_request('bitmart', 'ping') == ('ping', [])
+
+
+def test_subscribe_deliver_drop_and_resubscribe(monkeypatch):
+    async def scenario(port, runner, sessions, prices, sent):
+        wires = []
+
+        def wire(exchange, symbol):
+            wires.append(symbol)
+            return streams.wire_symbol(exchange, symbol)
+
+        ps = PriceStreams(sessions, lambda *tick: prices.append(tick), wire=wire)
+        await ps.sync([('gateio', 'BTCUSDT')])
+        await until(lambda: prices)
+        assert 'gateio' in ps.live
+        assert prices[0][:2] == ('gateio', 'BTCUSDT')
+        assert wires == ['BTCUSDT']  # subscriptions go through the caller's spelling
+        assert sent[0]['payload'] == ['BTC_USDT']
+
+        # The exchange goes away: the pair falls back to REST polling
+        await runner.cleanup()
+        await until(lambda: 'gateio' not in ps.live)
+
+        # ... and comes back: the stream reconnects and resubscribes
+        runner = await serve(port)
+        prices.clear()
+        await until(lambda: prices and 'gateio' in ps.live)
+        assert {tick[1] for tick in prices} == {'BTCUSDT'}
+
+        await ps.sync([])
+        await until(lambda: not ps._tasks)
+        assert not ps.live
+        await runner.cleanup()
+
+    run(monkeypatch, scenario)
+
+
+def test_concurrent_syncs_send_each_change_once(monkeypatch):
+    async def scenario(port, runner, sessions, prices, sent):
+        ps = PriceStreams(sessions, lambda *tick: prices.append(tick))
+        await ps.sync([('gateio', 'BTCUSDT')])
+        await until(lambda: 'gateio' in ps.live)
+        both = [('gateio', 'BTCUSDT'), ('gateio', 'ETHUSDT')]
+        await asyncio.gather(ps.sync(both), ps.sync(both))
+        subscribed = [w for p in sent if p.get('event') == 'subscribe' for w in p['payload']]
+        assert sorted(subscribed) == ['BTC_USDT', 'ETH_USDT']
+        await until(lambda: any(tick[1] == 'ETHUSDT' for tick in prices))
+        await ps.close()
+
+    run(monkeypatch, scenario)
+
+
+def test_socket_opened_after_every_alert_left_is_closed(monkeypatch):
+    async def scenario(port, runner, sessions, prices, sent):
+        connecting, release = asyncio.Event(), asyncio.Event()
+        connect_url = streams.GateIO.connect_url
+
+        async def slow_connect_url(self, session):
+            connecting.set()
+            await release.wait()
+            return await connect_url(self, session)
+
+        monkeypatch.setattr(streams.GateIO, 'connect_url', slow_connect_url)
+        ps = PriceStreams(sessions, lambda *tick: prices.append(tick))
+        await ps.sync([('gateio', 'BTCUSDT')])
+        await connecting.wait()
+        await ps.sync([])  # before the handshake finished
+        release.set()
+        await until(lambda: not ps._tasks)
+        assert not ps.live and not ps._sockets
+        assert not [p for p in sent if p.get('event') == 'subscribe']
+
+    run(monkeypatch, scenario)
+
+
+def test_pairs_the_stream_never_prices_are_not_covered(monkeypatch):
+    async def scenario(port, runner, sessions, prices, sent):
+        # The exchange answers ETHUSDT's subscription with nothing we recognise
+        def wire(exchange, symbol):
+            return 'NOPE' if symbol == 'ETHUSDT' else streams.wire_symbol(exchange, symbol)
+
+        ps = PriceStreams(sessions, lambda *tick: prices.append(tick), wire=wire)
+        await ps.sync([('gateio', 'BTCUSDT'), ('gateio', 'ETHUSDT')])
+        await until(lambda: ps.covers(('gateio', 'BTCUSDT')))
+        await asyncio.sleep(0.05)
+        assert 'gateio' in ps.live
+        assert not ps.covers(('gateio', 'ETHUSDT'))
+        # A pair that goes quiet is handed back to REST polling too
+        assert not ps.covers(('gateio', 'BTCUSDT'), now=time.monotonic() + streams.STREAM_STALE)
+        await ps.close()
+
+    run(monkeypatch, scenario)
+
+
+def test_symbols_are_split_across_connections_at_the_stream_limit(monkeypatch):
+    monkeypatch.setattr(streams.GateIO, 'max_streams', 2)
+
+    async def scenario(port, runner, sessions, prices, sent):
+        ps = PriceStreams(sessions, lambda *tick: prices.append(tick))
+        pairs = [('gateio', f"C{i}USDT") for i in range(5)]
+        await ps.sync(pairs)
+        await until(lambda: all(ps.covers(pair) for pair in pairs))
+        assert len(ps._up) == 3
+        # A freed place is filled before a new connection is opened
+        await ps.sync(pairs[1:] + [('gateio', 'D0USDT')])
+        assert ps._conn[('gateio', 'D0USDT')] == 0  # where C0USDT was
+        await until(lambda: ps.covers(('gateio', 'D0USDT')))
+        assert len(ps._up) == 3
+        assert sorted(n for _, n in ps._up) == [0, 1, 2]
+        assert not ps.covers(('gateio', 'C0USDT'))
+        await ps.close()
+
+    run(monkeypatch, scenario)
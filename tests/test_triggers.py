@@ -0,0 +1,73 @@
+from triggers import ALERT_COOLDOWN, ARMED, FIRED, SPREAD_HYSTERESIS, on_cross, rearm, watch_level
+
+
+def alert(**extra):
+    return {'exchange': 'binance', 'symbol': 'BTCUSDT', 'limit': 100.0, 'direction': 'above', **extra}
+
+
+def test_armed_alert_watches_its_limit():
+    assert watch_level(alert()) == ('above', 100.0)
+    assert watch_level(alert(direction='below')) == ('below', 100.0)
+
+
+def test_fired_alert_watches_the_rearm_level_on_the_other_side():
+    assert watch_level(alert(state=FIRED, hysteresis=1.0)) == ('below', 99.0)
+    assert watch_level(alert(direction='below', state=FIRED, hysteresis=1.0)) == ('above', 101.0)
+
+
+def test_spread_band_is_in_spread_points():
+    spread = alert(exchange_b='kucoin', limit=0.3, state=FIRED)
+    direction, level = watch_level(spread)
+    assert direction == 'below'
+    assert abs(level - (0.3 - SPREAD_HYSTERESIS)) < 1e-12
+    assert watch_level({**spread, 'hysteresis': 0.1})[1] == 0.3 - 0.1
+
+
+def test_fire_then_rearm_without_notifying():
+    a = alert(cooldown=0)
+    assert on_cross(a, 10.0)
+    assert a['state'] == FIRED and a['fired_at'] == 10.0
+    # Crossing the re-arm level arms it again, quietly
+    assert not on_cross(a, 11.0)
+    assert a['state'] == ARMED
+    assert on_cross(a, 12.0)
+
+
+def test_cooldown_keeps_an_armed_alert_quiet():
+    a = alert(state=ARMED, fired_at=100.0)
+    assert not on_cross(a, 100.0 + ALERT_COOLDOWN - 1)
+    assert a['state'] == ARMED and a['fired_at'] == 100.0
+    # The boundary itself is past the cooldown
+    assert on_cross(a, 100.0 + ALERT_COOLDOWN)
+    assert a['fired_at'] == 100.0 + ALERT_COOLDOWN
+
+
+def test_per_alert_cooldown_overrides_the_default():
+    a = alert(state=ARMED, fired_at=0.0, cooldown=5)
+    assert not on_cross(a, 4.9)
+    assert on_cross(a, 5.0)
+
+
+def test_rearm_forgets_the_last_firing():
+    a = alert(state=FIRED, fired_at=1_000_000.0)
+    rearm(a)
+    assert a['state'] == ARMED and 'fired_at' not in a
+    assert on_cross(a, 1_000_001.0)
+
+
+def test_spread_band_never_reaches_zero_spread():
+    tight = alert(exchange_b='kucoin', limit=0.03, state=FIRED)
+    assert watch_level(tight) == ('below', 0.015)
+    assert watch_level({**tight, 'hysteresis': 1.0}) == ('below', 0.015)
+
+
+def test_tight_spread_alert_fires_again_after_rearming():
+    from engine import AlertEngine
+    fired = []
+    engine = AlertEngine(lambda *hit: fired.append(hit[3]), lambda *change: None)
+    engine.add_many([(1, 's', alert(exchange_b='kucoin', limit=0.03, cooldown=0))])
+    engine.on_price('binance', 'BTCUSDT', 100.0, now=1.0)
+    engine.on_price('kucoin', 'BTCUSDT', 100.04, now=1.0)  # 0.04% apart: fires
+    engine.on_price('kucoin', 'BTCUSDT', 100.01, now=2.0)  # back under 0.015%: re-arms
+    engine.on_price('kucoin', 'BTCUSDT', 100.05, now=3.0)
+    assert len(fired) == 2
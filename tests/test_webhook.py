@@ -0,0 +1,99 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from webhook import SECRET_HEADER, WebhookServer
+
+
+class FakeDispatcher:
+    async def emit_startup(self, **kwargs):
+        pass
+
+    async def emit_shutdown(self, **kwargs):
+        pass
+
+    def resolve_used_update_types(self):
+        return ['message']
+
+
+class FakeBot:
+    def __init__(self):
+        self.webhooks = []
+
+    async def set_webhook(self, url, secret_token, allowed_updates):
+        self.webhooks.append((url, secret_token))
+
+
+def test_serving_without_url_needs_a_secret():
+    async def scenario():
+        server = WebhookServer(FakeDispatcher(), FakeBot(), secret='')
+        with pytest.raises(RuntimeError):
+            await server.start('127.0.0.1', 0, url='')
+
+    asyncio.run(scenario())
+
+
+def test_generated_secret_is_registered_and_enforced():
+    async def scenario():
+        bot = FakeBot()
+        server = WebhookServer(FakeDispatcher(), bot, secret='', workers=1)
+        await server.start('127.0.0.1', 0, url='https://example.org/')
+        try:
+            assert server.secret
+            assert bot.webhooks == [('https://example.org/webhook', server.secret)]
+            port = server._runner.addresses[0][1]
+            async with aiohttp.ClientSession() as session:
+                url = f"http://127.0.0.1:{port}/webhook"
+                async with session.post(url, json={}, headers={SECRET_HEADER: 'wrong'}) as resp:
+                    assert resp.status == 401
+                async with session.post(url, json={}, headers={SECRET_HEADER: server.secret}) as resp:
+                    assert resp.status == 400  # past the secret check, and not a valid update
+        finally:
+            await server.close()
+
+    asyncio.run(scenario())
+
+
+MESSAGE_UPDATE = {
+    'update_id': 1,
+    'message': {'message_id': 7, 'date': 1700000000, 'text': '/start',
+                'chat': {'id': 42, 'type': 'private'},
+                'from': {'id': 42, 'is_bot': False, 'first_name': 'A'}},
+}
+
+
+def test_updates_reach_the_dispatcher_and_unknown_types_are_acknowledged():
+    from aiogram import Bot, Dispatcher
+
+    async def scenario():
+        dp = Dispatcher()
+        seen = []
+
+        @dp.message()
+        async def on_message(message):
+            seen.append((message.from_user.id, message.text))
+
+        bot = Bot('123456:' + 'A' * 35)
+        server = WebhookServer(dp, bot, secret='s3cret', workers=2)
+        await server.start('127.0.0.1', 0, url='')
+        try:
+            port = server._runner.addresses[0][1]
+            headers = {SECRET_HEADER: 's3cret'}
+            async with aiohttp.ClientSession() as session:
+                url = f"http://127.0.0.1:{port}/webhook"
+                async with session.post(url, json=MESSAGE_UPDATE, headers=headers) as resp:
+                    assert resp.status == 200
+                # An update type aiogram doesn't model must not 500 (Telegram would retry it forever)
+                async with session.post(url, json={'update_id': 2}, headers=headers) as resp:
+                    assert resp.status == 200
+            for _ in range(100):
+                if seen:
+                    break
+                await asyncio.sleep(0.01)
+            assert seen == [(42, '/start')]
+        finally:
+            await server.close()
+            await bot.session.close()
+
+    asyncio.run(scenario())
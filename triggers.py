@@ -0,0 +1,54 @@
+import os
+
+# Defaults for alerts that don't set their own
+ALERT_HYSTERESIS = float(os.getenv('ALERT_HYSTERESIS', '0.2'))  # % the price must come back to re-arm
+ALERT_COOLDOWN = float(os.getenv('ALERT_COOLDOWN', '300'))  # seconds between two firings
+# Spread alert limits are themselves in %, so their band is in percentage points of spread
+SPREAD_HYSTERESIS = float(os.getenv('SPREAD_HYSTERESIS', '0.05'))
+
+ARMED, FIRED = 'armed', 'fired'
+
+
+def watch_level(alert):
+    """(direction, level) the index should watch for this alert's current state.
+
+    An armed alert waits for its own limit. A fired one waits for the price to
+    come back past the limit by the hysteresis band, so it is watched on the
+    opposite side at the re-arm level. A price alert's hysteresis is a % of
+    its limit; a spread alert's is in the limit's own unit, spread points,
+    capped at half the limit.
+    """
+    direction, limit = alert['direction'], alert['limit']
+    if alert.get('state', ARMED) != FIRED:
+        return direction, limit
+    if alert.get('exchange_b'):
+        # At most half the limit: a spread can't go below 0, so a wider band would never re-arm
+        band = min(alert.get('hysteresis', SPREAD_HYSTERESIS), limit / 2)
+    else:
+        band = limit * alert.get('hysteresis', ALERT_HYSTERESIS) / 100
+    if direction == 'above':
+        return 'below', limit - band
+    return 'above', limit + band
+
+
+def on_cross(alert, now):
+    """Advance the state machine when the watched level is crossed.
+
+    Returns True when the alert should notify (armed -> fired). A fired alert
+    crossing its re-arm level goes back to armed without notifying. Within
+    the cooldown window an armed alert stays armed and quiet.
+    """
+    if alert.get('state', ARMED) == FIRED:
+        alert['state'] = ARMED
+        return False
+    if now - alert.get('fired_at', 0) < alert.get('cooldown', ALERT_COOLDOWN):
+        return False
+    alert['state'] = FIRED
+    alert['fired_at'] = now
+    return True
+
+
+def rearm(alert):
+    """Back to armed, e.g. after the limit is edited or the alert is resumed"""
+    alert['state'] = ARMED
+    alert.pop('fired_at', None)
@@ -0,0 +1,132 @@
+"""Webhook mode: Telegram POSTs updates to an aiohttp endpoint instead of getUpdates long polling.
+
+    WEBHOOK=1 WEBHOOK_SECRET=s3cret python bot.py
+    curl -H 'X-Telegram-Bot-Api-Secret-Token: s3cret' -d @update.json http://127.0.0.1:8080/webhook
+
+With WEBHOOK_URL set the webhook is registered with Telegram at startup
+(WEBHOOK_URL + WEBHOOK_PATH) along with the secret, which is generated if
+WEBHOOK_SECRET is unset. Without it the endpoint just serves, e.g. for local
+testing or behind a webhook set by hand, and WEBHOOK_SECRET is required:
+it is the only way whoever calls the endpoint can know the secret.
+"""
+import asyncio
+import hmac
+import logging
+import os
+import secrets
+import signal
+
+from aiogram import types
+from aiogram.types.update import UpdateTypeLookupError
+from aiohttp import web
+
+WEBHOOK = os.getenv('WEBHOOK', '0') == '1'
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # public https root Telegram should call
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8080')))
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '32'))  # updates handled concurrently
+WEBHOOK_QUEUE = int(os.getenv('WEBHOOK_QUEUE', '64'))  # updates waiting per worker before we answer 503
+WEBHOOK_DRAIN = float(os.getenv('WEBHOOK_DRAIN', '10'))  # seconds to finish accepted updates on shutdown
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookServer:
+    """Accepts updates over HTTP and feeds them to the dispatcher from a bounded pool.
+
+    Each update is acknowledged as soon as it is queued. Updates go to one
+    of `workers` queues by user, so one user's presses stay in order while
+    different users are handled concurrently. A full queue answers 503 and
+    Telegram retries later. Requests without the secret get a 401.
+    `close()` stops accepting, lets the queued
+    updates finish for up to `drain` seconds, then stops the workers.
+    """
+
+    def __init__(self, dp, bot, secret=WEBHOOK_SECRET, path=WEBHOOK_PATH,
+                 workers=WEBHOOK_WORKERS, queue_size=WEBHOOK_QUEUE, drain=WEBHOOK_DRAIN):
+        self.dp = dp
+        self.bot = bot
+        self.secret = secret
+        self.path = path
+        self.drain = drain
+        self.queues = [asyncio.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.accepting = False
+        self._tasks = []
+        self._runner = None
+
+    async def handle(self, request):
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ''), self.secret):
+            return web.Response(status=401)
+        if not self.accepting:
+            return web.Response(status=503)
+        try:
+            update = types.Update.model_validate(await request.json(), context={'bot': self.bot})
+        except ValueError as e:
+            logging.warning(f"bad webhook update: {e}")
+            return web.Response(status=400)
+        try:
+            user = getattr(update.event, 'from_user', None)
+        except UpdateTypeLookupError:
+            user = None  # a type aiogram doesn't model: spread by update_id like any update without a user
+        try:
+            self.queues[(user.id if user else update.update_id) % len(self.queues)].put_nowait(update)
+        except asyncio.QueueFull:
+            return web.Response(status=503)
+        return web.Response()
+
+    async def _worker(self, queue):
+        while True:
+            update = await queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                logging.error(f"update {update.update_id} failed: {e!r}")
+            finally:
+                queue.task_done()
+
+    async def start(self, host=WEBHOOK_HOST, port=WEBHOOK_PORT, url=WEBHOOK_URL):
+        if not self.secret:
+            if not url:
+                raise RuntimeError("WEBHOOK_SECRET is required when WEBHOOK_URL is unset")
+            self.secret = secrets.token_urlsafe(32)  # only we and Telegram need it
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self._tasks = [asyncio.create_task(self._worker(q)) for q in self.queues]
+        self.accepting = True
+        await self.dp.emit_startup(bot=self.bot, dispatcher=self.dp)
+        if url:
+            await self.bot.set_webhook(url.rstrip('/') + self.path, secret_token=self.secret,
+                                       allowed_updates=self.dp.resolve_used_update_types())
+        logging.info(f"webhook on http://{host}:{port}{self.path} ({len(self.queues)} workers)")
+
+    async def close(self):
+        self.accepting = False
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self.queues)), self.drain)
+        except asyncio.TimeoutError:
+            logging.warning(f"webhook drain timed out, {sum(q.qsize() for q in self.queues)} updates dropped")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        await self.dp.emit_shutdown(bot=self.bot, dispatcher=self.dp)
+        if self._runner:
+            await self._runner.cleanup()
+
+
+async def run_webhook(dp, bot):
+    """Serve updates until SIGINT/SIGTERM, then drain"""
+    server = WebhookServer(dp, bot)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await server.start()
+    try:
+        await stop.wait()
+    finally:
+        await server.close()